@@ -1,8 +1,21 @@
 from fastapi import APIRouter
+from fastapi import Query
 from fastapi import status
+from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
+from orjson import orjson
 
+from app.clients.external_api.dadata.clients.dadata import dadata_api
 from app.core.cache import base_cache
-from app.core.cache import get_handler
+from app.core.health import health_checker
+from app.core.metrics import cache_metrics
+from app.core.settings import config
+from app.db.engine import engines
+from app.db.engine import get_pool_stats
+from app.db.engine import query_cache_stats
+from app.db.replicas import replica_set
+from app.schemas.response.cache import CacheFlushResponseSchema
+from app.schemas.response.cache import CacheKeysPageResponseSchema
 
 
 router = APIRouter()
@@ -12,33 +25,161 @@ router = APIRouter()
     "/users/redis/keys",
     summary="Получение кэшированных ключей",
     status_code=status.HTTP_200_OK,
+    response_model=CacheKeysPageResponseSchema,
 )
-async def get_cache_request() -> list[str]:
-    keys = await base_cache.get_all_keys()
+async def get_cache_request(
+    prefix: str = Query(config.CACHE_NAMESPACE, description="Префикс ключей"),
+    cursor: int = Query(0, ge=0, description="Курсор из предыдущего ответа"),
+    count: int = Query(100, ge=1, le=10000, description="Подсказка размера страницы"),
+) -> CacheKeysPageResponseSchema:
+    next_cursor, keys = await base_cache.scan_keys(
+        prefix=prefix, cursor=cursor, count=count
+    )
     decoded_keys = [elem.decode("utf8") for elem in keys]
-    return decoded_keys
+    return CacheKeysPageResponseSchema(cursor=next_cursor, keys=decoded_keys)
 
 
 @router.delete(
     "/users/redis/keys",
     summary="Удаление кэшированных данных",
-    status_code=status.HTTP_204_NO_CONTENT,
+    status_code=status.HTTP_200_OK,
+    response_model=CacheFlushResponseSchema,
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Итог удаления, при stream=true - прогресс в формате NDJSON"
+        },
+    },
+)
+async def delete_cache_request(
+    prefix: str = Query(config.CACHE_NAMESPACE, description="Префикс ключей"),
+    batch_size: int = Query(500, ge=1, le=10000),
+    stream: bool = Query(False, description="Отдавать прогресс после каждой пачки"),
+):
+    if not stream:
+        return await base_cache.delete_keys(prefix=prefix, batch_size=batch_size)
+
+    async def progress():
+        async for item in base_cache.iter_delete_keys(prefix, batch_size):
+            yield orjson.dumps(item) + b"\n"
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/cache/stats",
+    summary="Статистика кэша по пространствам имен ключей",
+    description=(
+        "Счетчики попаданий/промахов/ошибок и гистограммы задержек чтения, записи, "
+        "запросов во внешний API и размера значений (в байтах)"
+    ),
+    status_code=status.HTTP_200_OK,
+)
+async def get_cache_stats() -> dict:
+    return dict(
+        namespaces=cache_metrics.get_stats(),
+        local=base_cache.get_local_stats(),
+        backend=base_cache.get_backend_stats(),
+    )
+
+
+@router.get(
+    "/cache/pool",
+    summary="Статистика пула соединений redis",
+    status_code=status.HTTP_200_OK,
 )
-async def get_cache_request():
-    await base_cache.delete_all_keys()
+async def get_cache_pool_stats() -> dict:
+    return base_cache.get_pool_stats()
+
+
+@router.get(
+    "/health/live",
+    name="service:liveness",
+    summary="Liveness: процесс отвечает, зависимости не проверяются",
+    status_code=status.HTTP_200_OK,
+)
+async def get_liveness() -> dict:
+    return dict(alive=True)
+
+
+@router.get(
+    "/health/ready",
+    name="service:readiness",
+    summary="Readiness: доступность redis, postgres и внешних API",
+    description=(
+        "Результаты проверок кэшируются на HEALTHCHECK_CACHE_SECONDS, каждая проверка "
+        "ограничена HEALTHCHECK_TIMEOUT_SECONDS. 503, если недоступен критичный компонент"
+    ),
+    status_code=status.HTTP_200_OK,
+    responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"description": "Сервис не готов"}},
+)
+async def get_readiness():
+    readiness = await health_checker.readiness()
+    if not readiness["ready"]:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=readiness
+        )
+    return readiness
 
 
 @router.get(
     "/healthcheck",
     name="service:healthcheck",
+    deprecated=True,
 )
 async def get_healthcheck():
-    handler = get_handler(key="test", ttl_seconds=30)
-    components = [
-        dict(
-            component="redis",
-            liveness=await handler.is_alive(),
-        )
+    readiness = await health_checker.readiness()
+    return [
+        dict(component=item["component"], liveness=item["alive"])
+        for item in readiness["components"]
     ]
 
-    return components
+
+@router.get(
+    "/db/replicas",
+    summary="Состояние реплик БД для чтения",
+    description="Реплика участвует в ротации, если healthy (отставание не больше порога)",
+    status_code=status.HTTP_200_OK,
+)
+async def get_db_replicas() -> list[dict]:
+    return replica_set.get_stats()
+
+
+@router.get(
+    "/db/query_cache",
+    summary="Статистика кэша скомпилированного SQL по движкам",
+    description="cache_miss растет только на новых запросах; в стабильном режиме - cache_hit",
+    status_code=status.HTTP_200_OK,
+)
+async def get_db_query_cache_stats() -> dict:
+    return query_cache_stats.get_stats()
+
+
+@router.get(
+    "/db/pool",
+    summary="Статистика пулов соединений БД по движкам",
+    description=(
+        "checked_out/idle/overflow - текущее состояние, wait_seconds - время "
+        "получения соединения из пула, timeouts - отказы по DB_POOL_TIMEOUT_SECONDS"
+    ),
+    status_code=status.HTTP_200_OK,
+)
+async def get_db_pool_stats() -> dict:
+    return {name: get_pool_stats(engine) for name, engine in engines.items()}
+
+
+@router.get(
+    "/clients/pool",
+    summary="Статистика пулов соединений HTTP клиентов",
+    status_code=status.HTTP_200_OK,
+)
+async def get_clients_pool_stats() -> list[dict]:
+    return [dadata_api.get_pool_stats()]
+
+
+@router.get(
+    "/clients/circuit_breakers",
+    summary="Состояние circuit breaker HTTP клиентов",
+    status_code=status.HTTP_200_OK,
+)
+async def get_clients_circuit_breakers() -> list[dict]:
+    return [dadata_api.get_circuit_breaker().get_stats()]
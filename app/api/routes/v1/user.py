@@ -1,10 +1,22 @@
+from typing import Optional
+
 from fastapi import APIRouter
+from fastapi import HTTPException
+from fastapi import Query
 from fastapi import status
+from fastapi.responses import StreamingResponse
+from orjson import orjson
+from pydantic import constr
 
 from app.models.repositories.user import UserRepo
 from app.logic import user as logic_user
 from app.schemas.request.user import CreateUserRequestSchema
+from app.schemas.request.user import CreateUsersBatchRequestSchema
+from app.schemas.response.user import UserBatchItemResponseSchema
 from app.schemas.response.user import UserResponseSchema
+from app.schemas.response.user import UsersBatchResponseSchema
+from app.schemas.response.user import UsersPageResponseSchema
+from app.schemas.response.user import UsersSearchResponseSchema
 
 
 router = APIRouter()
@@ -27,6 +39,119 @@ async def create_user_request(
     return response
 
 
+@router.post(
+    "/users/batch",
+    summary="Пакетное создание пользователей",
+    status_code=status.HTTP_200_OK,
+    response_model=UsersBatchResponseSchema,
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Результат по каждой строке: created, invalid или duplicate"
+        },
+    },
+)
+async def create_users_batch_request(
+    batch: CreateUsersBatchRequestSchema,
+) -> UsersBatchResponseSchema:
+    results = await logic_user.create_users(users=batch.users)
+    created = sum(result["status"] == "created" for result in results)
+    return UsersBatchResponseSchema(
+        created=created,
+        failed=len(results) - created,
+        results=[
+            UserBatchItemResponseSchema(
+                index=result["index"],
+                status=result["status"],
+                user=UserResponseSchema(**dict(result["user"]))
+                if "user" in result
+                else None,
+                errors=result.get("errors"),
+            )
+            for result in results
+        ],
+    )
+
+
+@router.get(
+    "/users",
+    summary="Список пользователей",
+    description=(
+        "Постраничный список по id (keyset-пагинация, курсор из next_cursor). "
+        "При stream=true - все пользователи в формате NDJSON без пагинации"
+    ),
+    status_code=status.HTTP_200_OK,
+    response_model=UsersPageResponseSchema,
+    responses={
+        status.HTTP_200_OK: {"description": "Страница или выгрузка пользователей"},
+        status.HTTP_400_BAD_REQUEST: {"description": "Невалидный курсор"},
+    },
+)
+async def list_users_request(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor из предыдущего ответа"
+    ),
+    with_total: bool = Query(False, description="Оценка общего числа пользователей"),
+    stream: bool = Query(False, description="Выгрузка всех пользователей в NDJSON"),
+    name: Optional[str] = None,
+    surname: Optional[str] = None,
+    country: Optional[str] = None,
+    email: Optional[str] = None,
+):
+    filters = {
+        key: value
+        for key, value in dict(
+            name=name, surname=surname, country=country, email=email
+        ).items()
+        if value is not None
+    }
+
+    if stream:
+
+        async def export():
+            async for user in logic_user.export_users(**filters):
+                yield orjson.dumps(dict(UserResponseSchema(**dict(user)))) + b"\n"
+
+        return StreamingResponse(export(), media_type="application/x-ndjson")
+
+    try:
+        users, next_cursor, total = await logic_user.list_users(
+            limit=limit, cursor=cursor, with_total=with_total, **filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return UsersPageResponseSchema(
+        items=[UserResponseSchema(**dict(user)) for user in users],
+        next_cursor=next_cursor,
+        estimated_total=total,
+    )
+
+
+@router.get(
+    "/users/search",
+    summary="Поиск пользователей",
+    description=(
+        "Нечеткий поиск по имени, фамилии и отчеству и по части email "
+        "без учета регистра. Лучшие совпадения первыми"
+    ),
+    status_code=status.HTTP_200_OK,
+    response_model=UsersSearchResponseSchema,
+    responses={
+        status.HTTP_200_OK: {"description": "Найденные пользователи"},
+    },
+)
+async def search_users_request(
+    # короче 3 символов (без пробелов по краям) нет триграмм и индекс не помогает
+    q: constr(strip_whitespace=True, min_length=3, max_length=100) = Query(...),
+    limit: int = Query(20, ge=1, le=100),
+) -> UsersSearchResponseSchema:
+    users = await logic_user.search_users(q=q, limit=limit)
+    return UsersSearchResponseSchema(
+        items=[UserResponseSchema(**dict(user)) for user in users]
+    )
+
+
 @router.get(
     "/users/{phone_number}",
     summary="Получение данных о пользователе",
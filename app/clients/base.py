@@ -1,16 +1,35 @@
+from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack
+from functools import partial
 from typing import Any
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
 from typing import Literal
 from typing import Optional
 from typing import Tuple
+import asyncio
+import ssl
 
 from aiohttp import BasicAuth
+from aiohttp import ClientError
+from aiohttp import ClientTimeout
 from aiohttp import ContentTypeError
+from aiohttp import TCPConnector
 from aiohttp.client import ClientSession
 
 from app.clients.exceptions import BadRequestAPIException
 from app.clients.exceptions import ClientErrorAPIException
 from app.clients.exceptions import ServerErrorAPIException
+from app.clients.resilience import backoff_delay
+from app.clients.resilience import CircuitBreaker
+from app.clients.resilience import RetryBudget
+from app.core.cache import NegativeEntry
 from app.core.cache import RedisCacheBaseHandler
+from app.core.metrics import cache_metrics
+from app.core.settings import config
+from app.core.singleflight import request_coalescer
 
 
 __all__ = [
@@ -18,9 +37,126 @@ __all__ = [
 ]
 
 
+# фоновые обновления устаревших значений (stale-while-revalidate), по ключу кэша
+_background_refreshes: Dict[str, asyncio.Future] = {}
+
+
 class BaseAPI:
     base_url: Optional[str] = None
 
+    # Параметры пула соединений, могут быть переопределены в наследнике
+    limit: int = config.HTTP_CLIENT_LIMIT
+    limit_per_host: int = config.HTTP_CLIENT_LIMIT_PER_HOST
+    keepalive_timeout: float = config.HTTP_CLIENT_KEEPALIVE_TIMEOUT
+    dns_cache_ttl: int = config.HTTP_CLIENT_DNS_CACHE_TTL
+
+    connect_timeout: float = config.HTTP_CLIENT_CONNECT_TIMEOUT
+    read_timeout: float = config.HTTP_CLIENT_READ_TIMEOUT
+    total_timeout: float = config.HTTP_CLIENT_TOTAL_TIMEOUT
+
+    max_retries: int = config.HTTP_CLIENT_MAX_RETRIES
+    retry_backoff: float = config.HTTP_CLIENT_RETRY_BACKOFF
+    retry_backoff_max: float = config.HTTP_CLIENT_RETRY_BACKOFF_MAX
+    retry_budget_ratio: float = config.HTTP_CLIENT_RETRY_BUDGET_RATIO
+    retry_budget_max: float = config.HTTP_CLIENT_RETRY_BUDGET_MAX
+
+    # методы, запросы которыми повторяются по умолчанию: повтор изменяющего
+    # запроса после таймаута может применить его дважды. retry=True в вызове -
+    # повторять и другие (запрос без побочных эффектов, например поиск через POST)
+    retry_methods: Tuple[str, ...] = ("get",)
+
+    breaker_failure_threshold: int = config.HTTP_CLIENT_BREAKER_FAILURE_THRESHOLD
+    breaker_recovery_seconds: float = config.HTTP_CLIENT_BREAKER_RECOVERY_SECONDS
+
+    # Ошибки 4xx кэшируются негативной записью, кроме этих статусов
+    negative_cache_exclude: Tuple[int, ...] = (408, 429)
+
+    # Сессия живет все время работы приложения, своя для каждого класса клиента
+    _session: Optional[ClientSession] = None
+    _circuit_breaker: Optional[CircuitBreaker] = None
+    _retry_budget: Optional[RetryBudget] = None
+
+    @classmethod
+    async def start_up(cls):
+        if cls._session is None or cls._session.closed:
+            connector = TCPConnector(
+                limit=cls.limit,
+                limit_per_host=cls.limit_per_host,
+                keepalive_timeout=cls.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=cls.dns_cache_ttl,
+                # общий SSL контекст на все соединения пула
+                ssl=ssl.create_default_context(),
+            )
+            cls._session = ClientSession(
+                connector=connector,
+                timeout=cls.get_timeout(),
+            )
+
+    @classmethod
+    async def gracefully_closing(cls):
+        if cls._session is not None:
+            await cls._session.close()
+            cls._session = None
+
+    @classmethod
+    def get_timeout(cls) -> ClientTimeout:
+        return ClientTimeout(
+            total=cls.total_timeout,
+            sock_connect=cls.connect_timeout,
+            sock_read=cls.read_timeout,
+        )
+
+    @classmethod
+    def get_circuit_breaker(cls) -> CircuitBreaker:
+        # состояние храним в самом классе клиента, а не в базовом
+        if cls.__dict__.get("_circuit_breaker") is None:
+            cls._circuit_breaker = CircuitBreaker(
+                name=cls.__name__,
+                failure_threshold=cls.breaker_failure_threshold,
+                recovery_seconds=cls.breaker_recovery_seconds,
+            )
+        return cls._circuit_breaker
+
+    @classmethod
+    def get_retry_budget(cls) -> RetryBudget:
+        if cls.__dict__.get("_retry_budget") is None:
+            cls._retry_budget = RetryBudget(
+                ratio=cls.retry_budget_ratio,
+                max_tokens=cls.retry_budget_max,
+            )
+        return cls._retry_budget
+
+    @classmethod
+    def get_pool_stats(cls) -> dict:
+        session = cls._session
+        if session is None or session.closed:
+            return dict(client=cls.__name__, active=False)
+
+        connector = session.connector
+        return dict(
+            client=cls.__name__,
+            active=True,
+            limit=connector.limit,
+            limit_per_host=connector.limit_per_host,
+            acquired=len(connector._acquired),
+            idle=sum(len(conns) for conns in connector._conns.values()),
+            waiting=sum(len(waiters) for waiters in connector._waiters.values()),
+        )
+
+    @classmethod
+    @asynccontextmanager
+    async def _session_scope(cls) -> AsyncIterator[ClientSession]:
+        """
+        Отдает общую сессию клиента. Если она не была открыта на старте приложения
+        (например, при вызове из cli), то создается одноразовая сессия.
+        """
+        if cls._session is not None and not cls._session.closed:
+            yield cls._session
+        else:
+            async with ClientSession(timeout=cls.get_timeout()) as session:
+                yield session
+
     async def cached_request(
         self,
         cache_handler: RedisCacheBaseHandler,
@@ -29,23 +165,124 @@ class BaseAPI:
         headers: Optional[dict] = None,
         params: Optional[dict] = None,
         json_data: Optional[dict] = None,
+        is_empty: Optional[Callable[[Any], bool]] = None,
+        retry: Optional[bool] = None,
     ):
+        """
+        is_empty - признак ответа без данных, такой ответ кэшируется негативной
+        записью с коротким TTL (как и ошибки 4xx). retry - как в _request.
+        """
 
-        status_code = 200
-        response = await cache_handler.get_value()
+        request_and_cache = partial(
+            self.request_and_cache,
+            cache_handler=cache_handler,
+            method=method,
+            path=path,
+            headers=headers,
+            params=params,
+            json_data=json_data,
+            is_empty=is_empty,
+            retry=retry,
+        )
 
+        response, is_stale = await cache_handler.get_entry()
         if response is None:
-            status_code, response = await self._request(
-                method=method,
-                path=path,
-                headers=headers,
-                params=params,
-                json_data=json_data,
-            )
+            return await request_and_cache()
+
+        if is_stale:
+            self._refresh_in_background(cache_handler.key, request_and_cache)
+        return self._from_cache(response)
+
+    @staticmethod
+    def _refresh_in_background(
+        key: str,
+        request_and_cache: Callable[[], Awaitable[Tuple[int, Any]]],
+    ):
+        """Не больше одного фонового обновления на ключ в процессе"""
+
+        if key in _background_refreshes:
+            return
+
+        task = asyncio.ensure_future(request_and_cache())
+        _background_refreshes[key] = task
+
+        def done(task: asyncio.Future):
+            _background_refreshes.pop(key, None)
+            if not task.cancelled():
+                # ошибка обновления не важна: пока есть устаревшее значение,
+                # отдаем его, после окончания grace периода запрос пойдет синхронно
+                task.exception()
+
+        task.add_done_callback(done)
+
+    async def request_and_cache(
+        self,
+        cache_handler: RedisCacheBaseHandler,
+        method: Literal["get", "post", "put", "patch", "delete"],
+        path: str,
+        headers: Optional[dict] = None,
+        params: Optional[dict] = None,
+        json_data: Optional[dict] = None,
+        is_empty: Optional[Callable[[Any], bool]] = None,
+        retry: Optional[bool] = None,
+    ) -> Tuple[int, Any]:
+        """Запрос во внешний API без чтения кэша, ответ сохраняется в кэш"""
+
+        request = partial(
+            self._request,
+            method=method,
+            path=path,
+            headers=headers,
+            params=params,
+            json_data=json_data,
+            retry=retry,
+        )
+        # одновременные промахи по одному ключу ждут один запрос во внешний API
+        return await request_coalescer.do(
+            cache_handler.key,
+            lambda: self._fetch_and_cache(cache_handler, request, is_empty),
+        )
+
+    async def _fetch_and_cache(
+        self,
+        cache_handler: RedisCacheBaseHandler,
+        request: Callable[[], Awaitable[Tuple[int, Any]]],
+        is_empty: Optional[Callable[[Any], bool]] = None,
+    ) -> Tuple[int, Any]:
+        async with AsyncExitStack() as stack:
+            if config.CACHE_DISTRIBUTED_LOCK:
+                await stack.enter_async_context(cache_handler.lock())
+                # пока ждали блокировку, ключ мог обновить другой воркер
+                response, is_stale = await cache_handler.get_entry()
+                if response is not None and not is_stale:
+                    return self._from_cache(response)
+
+            try:
+                with cache_metrics.timer(cache_handler.namespace, "upstream"):
+                    status_code, response = await request()
+            except ClientErrorAPIException as e:
+                if e.status_code not in self.negative_cache_exclude:
+                    await cache_handler.set_negative(e.status_code, e.detail)
+                raise
+
             if status_code == 200:
-                await cache_handler.set_value(response)
+                if is_empty is not None and is_empty(response):
+                    await cache_handler.set_negative(status_code, response)
+                else:
+                    await cache_handler.set_value(response)
         return status_code, response
 
+    @staticmethod
+    def _from_cache(value: Any) -> Tuple[int, Any]:
+        if not isinstance(value, NegativeEntry):
+            return 200, value
+
+        if value.status_code == 400:
+            raise BadRequestAPIException(value.status_code, value.detail)
+        elif 400 < value.status_code <= 499:
+            raise ClientErrorAPIException(value.status_code, value.detail)
+        return value.status_code, value.detail
+
     @classmethod
     async def _request(
         cls,
@@ -55,6 +292,62 @@ class BaseAPI:
         params: Optional[dict] = None,
         json_data: Optional[Any] = None,
         auth: Optional[BasicAuth] = None,
+        retry: Optional[bool] = None,
+    ) -> Tuple[int, Any]:
+        """
+        Запрос с повторами при 5xx, ошибках соединения и таймаутах. Число повторов
+        ограничено max_retries и бюджетом повторов клиента. Пока circuit breaker
+        открыт, запрос не выполняется и сразу поднимается CircuitOpenAPIException.
+        retry - повторять ли запрос, None - только для методов из retry_methods.
+        """
+
+        if retry is None:
+            retry = method in cls.retry_methods
+        breaker = cls.get_circuit_breaker()
+        retry_budget = cls.get_retry_budget()
+        retry_budget.deposit()
+
+        attempt = 0
+        while True:
+            breaker.before_call()
+            try:
+                result = await cls._send(
+                    method=method,
+                    path=path,
+                    headers=headers,
+                    params=params,
+                    json_data=json_data,
+                    auth=auth,
+                )
+            except ClientErrorAPIException:
+                # 4xx - внешний API работает, ошибка в запросе
+                breaker.record_success()
+                raise
+            except (ServerErrorAPIException, ClientError, asyncio.TimeoutError):
+                breaker.record_failure()
+                if (
+                    not retry
+                    or attempt >= cls.max_retries
+                    or not retry_budget.withdraw()
+                ):
+                    raise
+                attempt += 1
+                await asyncio.sleep(
+                    backoff_delay(attempt, cls.retry_backoff, cls.retry_backoff_max)
+                )
+            else:
+                breaker.record_success()
+                return result
+
+    @classmethod
+    async def _send(
+        cls,
+        method: Literal["get", "post", "put", "patch", "delete"],
+        path: str,
+        headers: Optional[dict] = None,
+        params: Optional[dict] = None,
+        json_data: Optional[Any] = None,
+        auth: Optional[BasicAuth] = None,
     ) -> Tuple[int, Any]:
         _url = f"{cls.base_url}{path}"
         _headers = {
@@ -67,7 +360,7 @@ class BaseAPI:
         _params = params or {}
         _json = json_data or {}
 
-        async with ClientSession() as session:
+        async with cls._session_scope() as session:
             _session_method = getattr(session, method)
             async with _session_method(
                 url=_url,
@@ -116,3 +409,8 @@ class BaseAPI:
             status_code = e.status_code
 
         return status_code, response
+
+    @classmethod
+    async def is_alive(cls) -> bool:
+        status_code, _ = await cls.get_alive()
+        return 200 <= status_code < 300
@@ -21,3 +21,10 @@ class ServerErrorAPIException(HTTPException):
     def __init__(self, status_code: int, body: str):
         self.status_code = status_code
         self.detail = body
+
+
+class CircuitOpenAPIException(ServerErrorAPIException):
+    """Внешний API временно недоступен, запрос не выполнялся"""
+
+    def __init__(self, client_name: str):
+        super().__init__(503, f"{client_name}: circuit breaker is open")
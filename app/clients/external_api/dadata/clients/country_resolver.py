@@ -0,0 +1,95 @@
+from datetime import date
+from pathlib import Path
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+import json
+
+from app.clients.external_api.dadata.schemas.response.dadata import DadataCountryData
+
+
+SNAPSHOT_DIR = Path(__file__).parent.parent.joinpath("data")
+SNAPSHOT_PREFIX = "countries_"
+
+
+def normalize_country(country: str) -> str:
+    return " ".join(str(country).split()).lower()
+
+
+def latest_snapshot(directory: Path = SNAPSHOT_DIR) -> Optional[Path]:
+    snapshots = sorted(directory.glob(f"{SNAPSHOT_PREFIX}*.json"))
+    return snapshots[-1] if snapshots else None
+
+
+def write_snapshot(
+    countries: Iterable[DadataCountryData],
+    source: str,
+    directory: Path = SNAPSHOT_DIR,
+) -> Path:
+    """Сохраняет справочник в новый файл, версия - текущая дата"""
+
+    version = date.today().strftime("%Y%m%d")
+    path = directory.joinpath(f"{SNAPSHOT_PREFIX}{version}.json")
+    snapshot = dict(
+        version=version,
+        source=source,
+        countries=[dict(country) for country in countries],
+    )
+    with path.open("w", encoding="utf8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    return path
+
+
+class CountryResolver:
+    """
+    Справочник стран в памяти. Ищет страну по названию, краткому названию,
+    alfa2/alfa3 и цифровому коду без учета регистра и лишних пробелов.
+    """
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self.countries: List[DadataCountryData] = []
+        self._index: Dict[str, DadataCountryData] = {}
+
+    def start_up(self, path: Optional[Path] = None):
+        path = path or latest_snapshot()
+        if path is None:
+            return None
+
+        with path.open(encoding="utf8") as f:
+            snapshot = json.load(f)
+
+        self.load(
+            [DadataCountryData(**country) for country in snapshot["countries"]],
+            version=snapshot["version"],
+        )
+
+    def load(self, countries: List[DadataCountryData], version: Optional[str] = None):
+        index = {}
+        for country in countries:
+            for alias in (
+                country.name,
+                country.name_short,
+                country.alfa2,
+                country.alfa3,
+                str(country.code),
+            ):
+                key = normalize_country(alias)
+                index.setdefault(key, country)
+                index.setdefault(key.replace("ё", "е"), country)
+
+        self.countries = countries
+        self.version = version
+        self._index = index
+
+    def resolve(self, country: str) -> Optional[DadataCountryData]:
+        key = normalize_country(country)
+        return self._index.get(key) or self._index.get(key.replace("ё", "е"))
+
+    def __len__(self) -> int:
+        return len(self.countries)
+
+
+country_resolver = CountryResolver()
@@ -1,43 +1,174 @@
+from typing import Iterable
+from typing import Optional
+import asyncio
+
+from aiohttp import ClientError
 from fastapi import HTTPException
 
 from app.clients.base import BaseAPI
 from app.clients.exceptions import BadRequestAPIException
 from app.clients.exceptions import ClientErrorAPIException
+from app.clients.external_api.dadata.clients.country_resolver import country_resolver
+from app.clients.external_api.dadata.clients.country_resolver import (
+    normalize_country,
+)
+from app.clients.external_api.dadata.schemas.response.dadata import DadataCountryData
 from app.clients.external_api.dadata.schemas.response.dadata import (
     DadataCountryResponse,
 )
+from app.clients.external_api.dadata.schemas.response.dadata import (
+    DadataCountrySuggestion,
+)
 from app.core.cache import get_handler
+from app.core.cache import get_values
+from app.core.cache import NegativeEntry
+from app.core.cache import RedisCacheBaseHandler
 from app.core.settings import config
 
 
+def _is_empty(response: dict) -> bool:
+    return not response.get("suggestions")
+
+
+def _resolved_response(data: DadataCountryData) -> DadataCountryResponse:
+    suggestion = DadataCountrySuggestion(
+        value=data.name_short,
+        unrestricted_value=data.name_short,
+        data=data,
+    )
+    return DadataCountryResponse(suggestions=[suggestion])
+
+
 class DadataGatewayAPI(BaseAPI):
 
     base_url = f"{config.DADATA_APP_URL}"
-    CACHE_NAMESPACE = "my_project"
+    CACHE_NAMESPACE = config.CACHE_NAMESPACE
+    COUNTRY_CACHE_TTL = 60 * 60 * 5
+    COUNTRY_NEGATIVE_CACHE_TTL = 60 * 10
+    # после истечения TTL значение еще час отдается из кэша и обновляется в фоне
+    COUNTRY_STALE_GRACE = 60 * 60
 
-    async def get_country_info(self, country: str):
+    def _country_cache_handler(self, country: str) -> RedisCacheBaseHandler:
+        return get_handler(
+            key=f"{self.CACHE_NAMESPACE}_get_country_info_{country}",
+            namespace=f"{self.CACHE_NAMESPACE}_get_country_info",
+            ttl_seconds=self.COUNTRY_CACHE_TTL,
+            negative_ttl_seconds=self.COUNTRY_NEGATIVE_CACHE_TTL,
+            stale_grace_seconds=self.COUNTRY_STALE_GRACE,
+        )
 
-        cache_handler = get_handler(
-            key=f"my_project_get_country_info_{country}",
-            ttl_seconds=60 * 60 * 5,
+    @staticmethod
+    def _country_request(country: str) -> dict:
+        return dict(
+            headers={
+                "Content-Type": "application/json",
+                "authorization": config.DADATA_APP_KEY,
+            },
+            method="post",
+            path="/api/4_1/rs/suggest/country",
+            json_data={
+                "query": country,
+            },
+            is_empty=_is_empty,
+            # поиск через POST без побочных эффектов - повторять безопасно
+            retry=True,
         )
+
+    @staticmethod
+    def _resolve_offline(country: str) -> Optional[DadataCountryResponse]:
+        if not config.COUNTRY_RESOLVER_ENABLED:
+            return None
+        resolved = country_resolver.resolve(country)
+        return _resolved_response(resolved) if resolved is not None else None
+
+    async def get_country_info(self, country: str):
+        resolved = self._resolve_offline(country)
+        if resolved is not None:
+            return resolved
+
+        country = normalize_country(country)
+
         try:
             status_code, response = await self.cached_request(
-                cache_handler=cache_handler,
-                headers={
-                    "Content-Type": "application/json",
-                    "authorization": config.DADATA_APP_KEY,
-                },
-                method="post",
-                path="/api/4_1/rs/suggest/country",
-                json_data={
-                    "query": str(country),
-                },
+                cache_handler=self._country_cache_handler(country),
+                **self._country_request(country),
             )
         except (ClientErrorAPIException, BadRequestAPIException) as e:
             raise HTTPException(status_code=e.status_code, detail=e.detail)
 
         return DadataCountryResponse(**response)
 
+    async def get_countries_info(
+        self,
+        countries: Iterable[str],
+        concurrency: int = 5,
+    ) -> dict[str, Optional[DadataCountryResponse]]:
+        """
+        Информация о нескольких странах: закэшированные берутся одним MGET,
+        остальные запрашиваются в dadata не более чем concurrency запросами разом.
+        Ключи результата - исходные строки, для неудачных запросов - None.
+        """
+
+        result = {}
+        normalized = {}
+        for country in countries:
+            resolved = self._resolve_offline(country)
+            if resolved is not None:
+                result[country] = resolved
+            else:
+                normalized[country] = normalize_country(country)
+
+        unique = list(dict.fromkeys(normalized.values()))
+        handlers = [self._country_cache_handler(country) for country in unique]
+
+        responses = dict(zip(unique, await get_values(handlers)))
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(country: str, handler: RedisCacheBaseHandler):
+            async with semaphore:
+                try:
+                    _, response = await self.request_and_cache(
+                        cache_handler=handler,
+                        **self._country_request(country),
+                    )
+                except (HTTPException, ClientError, asyncio.TimeoutError):
+                    response = None
+            responses[country] = response
+
+        await asyncio.gather(
+            *[
+                fetch(country, handler)
+                for country, handler in zip(unique, handlers)
+                if responses[country] is None
+            ]
+        )
+
+        for country, key in normalized.items():
+            response = responses[key]
+            if isinstance(response, NegativeEntry):
+                response = response.detail if response.status_code == 200 else None
+            result[country] = (
+                DadataCountryResponse(**response) if response is not None else None
+            )
+        return result
+
+    async def find_country_by_id(self, code: str) -> Optional[DadataCountryData]:
+        """Поиск страны по коду (цифровому, alfa2, alfa3) в обход кэша"""
+
+        _, response = await self._request(
+            headers={
+                "authorization": config.DADATA_APP_KEY,
+            },
+            method="post",
+            path="/api/4_1/rs/findById/country",
+            json_data={
+                "query": code,
+            },
+            retry=True,
+        )
+        suggestions = DadataCountryResponse(**response).suggestions
+        return suggestions[0].data if suggestions else None
+
 
 dadata_api = DadataGatewayAPI()
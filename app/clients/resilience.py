@@ -0,0 +1,93 @@
+from typing import Optional
+import random
+import time
+
+from app.clients.exceptions import CircuitOpenAPIException
+
+
+class RetryBudget:
+    """
+    Ограничивает долю повторных запросов: каждый запрос добавляет ratio токенов
+    (не больше max_tokens), каждый повтор забирает один токен.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Экспоненциальная задержка с полным джиттером"""
+
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, recovery_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_started_at: Optional[float] = None
+
+    def before_call(self):
+        """Поднимает CircuitOpenAPIException, если вызов выполнять нельзя"""
+
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.recovery_seconds:
+                raise CircuitOpenAPIException(self.name)
+            self.state = self.HALF_OPEN
+            self._trial_started_at = None
+
+        if self.state == self.HALF_OPEN:
+            # пробный вызов один; зависший пробный вызов не блокирует навсегда
+            if (
+                self._trial_started_at is not None
+                and now - self._trial_started_at < self.recovery_seconds
+            ):
+                raise CircuitOpenAPIException(self.name)
+            self._trial_started_at = now
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._trial_started_at = None
+
+    def get_stats(self) -> dict:
+        retry_in = None
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            retry_in = max(0.0, self.recovery_seconds - elapsed)
+        return dict(
+            name=self.name,
+            state=self.state,
+            failures=self.failures,
+            failure_threshold=self.failure_threshold,
+            retry_in_seconds=retry_in,
+        )
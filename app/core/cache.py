@@ -1,67 +1,412 @@
+from contextlib import asynccontextmanager
 from typing import Any
+from typing import AsyncIterator
+from typing import List
+from typing import NamedTuple
 from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Tuple
+import asyncio
+import time
 
-from aioredis.client import Redis as RedisClient
-from orjson import orjson
 import aioredis
 
+from app.core.cache_backends import BACKEND_ERRORS
+from app.core.cache_backends import CacheBackend
+from app.core.cache_backends import MemoryBackend
+from app.core.cache_backends import RedisBackend
+from app.core.cache_backends import TieredBackend
+from app.core.codecs import Codec
+from app.core.codecs import decode
+from app.core.codecs import get_codec
+from app.core.local_cache import LocalCache
+from app.core.metrics import cache_metrics
 from app.core.settings import config
 
 
 class RedisBaseCache:
+    """
+    Кэш поверх хранилища из CACHE_BACKEND. При ошибках основного хранилища
+    переключается на резервное в памяти процесса и в фоне проверяет, не
+    восстановилось ли основное. Ключи, измененные за время работы на резервном
+    хранилище, после восстановления удаляются из основного.
+    """
+
     def __init__(
         self,
-        aioredis_client: Optional[RedisClient] = None,
+        backend: Optional[CacheBackend] = None,
+        fallback: Optional[CacheBackend] = None,
+        reconnect_interval_seconds: float = 5.0,
+        max_dirty_keys: int = 10000,
     ):
-        self._client: Optional[RedisClient] = aioredis_client
+        self._backend: Optional[CacheBackend] = backend
+        self._fallback: Optional[CacheBackend] = fallback
+        self.reconnect_interval_seconds = reconnect_interval_seconds
+        self.max_dirty_keys = max_dirty_keys
+
+        self._degraded = False
+        self._dirty: Set[str] = set()
+        self._dirty_overflow = False
+        self._overflows = 0
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self.failovers = 0
 
     async def start_up(self):
-        if config.CACHING:
-            self._client = await aioredis.from_url(
-                url=config.REDIS_URL,
-            )
-        else:
+        if not config.CACHING:
             return None
 
-    async def set_value(self, key: str, value: bytes, ttl_seconds: int = 30):
-        if self._client:
-            await self._client.set(
-                name=key,
-                value=value,
-                ex=ttl_seconds,
-            )
+        self._backend = create_backend(config.CACHE_BACKEND)
+        if config.CACHE_FAILOVER_ENABLED and not isinstance(
+            self._backend, MemoryBackend
+        ):
+            self._fallback = create_backend("memory")
+        self.reconnect_interval_seconds = config.CACHE_RECONNECT_INTERVAL_SECONDS
+        self.max_dirty_keys = config.CACHE_MEMORY_MAX_ENTRIES
+        await self._backend.start()
+
+    @property
+    def backend(self) -> Optional[CacheBackend]:
+        """Хранилище, с которым кэш работает сейчас"""
+
+        return self._fallback if self._degraded else self._backend
+
+    @property
+    def degraded(self) -> bool:
+        return self._degraded
+
+    async def _call(self, method: str, *args, dirty_keys: Sequence[str] = ()) -> Any:
+        if not self._degraded:
+            try:
+                return await getattr(self._backend, method)(*args)
+            except BACKEND_ERRORS:
+                if self._fallback is None:
+                    raise
+                self._failover()
+
+        # запись могла частично дойти до основного хранилища
+        self._mark_dirty(dirty_keys)
+        return await getattr(self._fallback, method)(*args)
+
+    def _failover(self):
+        if self._degraded:
+            return
+        self._degraded = True
+        self.failovers += 1
+        self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    def _mark_dirty(self, keys: Sequence[str]):
+        self._dirty.update(keys)
+        if len(self._dirty) > self.max_dirty_keys:
+            self._dirty_overflow = True
+            self._overflows += 1
+            self._dirty.clear()
+
+    async def _reconnect(self):
+        while True:
+            await asyncio.sleep(self.reconnect_interval_seconds)
+            try:
+                if await self._backend.ping():
+                    await self._recover()
+                    return
+            except BACKEND_ERRORS:
+                pass
+
+    async def _recover(self):
+        """Удаляет из основного хранилища ключи, измененные за время сбоя"""
+
+        # состояние сбрасывается только после успешного удаления: при новой
+        # ошибке _reconnect повторит восстановление с оставшимися ключами
+        while self._dirty_overflow:
+            overflows, covered = self._overflows, set(self._dirty)
+            await self._delete_prefix(self._backend, config.CACHE_NAMESPACE)
+            self._dirty.difference_update(covered)
+            if self._overflows == overflows:
+                self._dirty_overflow = False
+
+        while self._dirty:
+            keys = list(self._dirty)[:500]
+            await self._backend.delete_many(keys)
+            self._dirty.difference_update(keys)
+
+        # между последней проверкой и переключением нет await
+        self._degraded = False
+        self._reconnect_task = None
+        await self._fallback.close()
+
+    @staticmethod
+    async def _delete_prefix(backend: CacheBackend, prefix: str):
+        cursor = 0
+        while True:
+            cursor, keys = await backend.scan(prefix, cursor, 500)
+            if keys:
+                await backend.delete_many(keys)
+            if cursor == 0:
+                break
+        await backend.invalidate_prefix(prefix)
+
+    async def set_value(
+        self,
+        key: str,
+        value: bytes,
+        ttl_seconds: int = 30,
+        nx: bool = False,
+    ) -> bool:
+        """nx - записать, только если ключа нет. Отдает признак записи"""
+
+        if not self._backend:
+            return False
+        return await self._call("set", key, value, ttl_seconds, nx, dirty_keys=[key])
+
+    async def get_value(self, key: str) -> Optional[bytes]:
+        if self._backend:
+            return (await self._call("get_many", [key]))[0]
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not (self._backend and keys):
+            return [None] * len(keys)
+        return await self._call("get_many", keys)
+
+    async def set_many(self, items: List[Tuple[str, bytes, int]]):
+        """items - (ключ, значение, ttl_seconds), запись за один запрос"""
+
+        if not (self._backend and items):
+            return
+        await self._call("set_many", items, dirty_keys=[key for key, _, _ in items])
+
+    async def delete_many(self, keys: List[str]):
+        if not (self._backend and keys):
+            return
+        await self._call("delete_many", keys, dirty_keys=keys)
 
-    async def get_value(self, key: str) -> Optional[str]:
-        if self._client:
-            cached_value = await self._client.get(name=key)
-            return cached_value
+    async def delete_value(self, key: str):
+        await self.delete_many([key])
+
+    def _redis_backend(self) -> Optional[RedisBackend]:
+        backend = self._backend
+        if isinstance(backend, TieredBackend):
+            backend = backend.remote
+        return backend if isinstance(backend, RedisBackend) else None
+
+    def get_pool_stats(self) -> dict:
+        backend = self._redis_backend()
+        if backend is None:
+            return dict(active=False)
+        return dict(active=True, **backend.get_stats())
+
+    def get_local_stats(self) -> Optional[dict]:
+        if isinstance(self._backend, TieredBackend):
+            return self._backend.local.get_stats()
+        return None
+
+    def get_backend_stats(self) -> dict:
+        if not self._backend:
+            return dict(backend=None)
+        return dict(
+            backend=self._backend.name,
+            degraded=self._degraded,
+            failovers=self.failovers,
+            dirty_keys=len(self._dirty),
+            dirty_overflow=self._dirty_overflow,
+            fallback=self._fallback.get_stats() if self._fallback else None,
+        )
+
+    @asynccontextmanager
+    async def lock(
+        self,
+        key: str,
+        timeout: float,
+        blocking_timeout: float,
+    ) -> AsyncIterator[bool]:
+        """Отдает True, если блокировку удалось захватить"""
+
+        if not self._backend:
+            yield False
+            return
+
+        async with self.backend.lock(key, timeout, blocking_timeout) as acquired:
+            yield acquired
+
+    async def scan_keys(
+        self,
+        prefix: str = "",
+        cursor: int = 0,
+        count: int = 100,
+    ) -> Tuple[int, List[bytes]]:
+        """
+        Одна страница SCAN по ключам с префиксом. count - подсказка redis, размер
+        страницы может отличаться. Нулевой курсор в ответе - ключи закончились.
+        """
+
+        if not self._backend:
+            return 0, []
+        return await self._call("scan", prefix, cursor, count)
+
+    async def iter_delete_keys(
+        self,
+        prefix: str = "",
+        batch_size: int = 500,
+    ) -> AsyncIterator[dict]:
+        """
+        Удаляет ключи с префиксом пачками через UNLINK (без блокировки redis),
+        после каждой пачки отдает прогресс.
+        """
+
+        if not self._backend:
+            return
+
+        deleted = 0
+        batches = 0
+        cursor = 0
+        while True:
+            cursor, keys = await self.scan_keys(prefix, cursor, batch_size)
+            if keys:
+                keys = [key.decode("utf8") for key in keys]
+                deleted += await self._call("delete_many", keys, dirty_keys=keys)
+                batches += 1
+                yield dict(prefix=prefix, deleted=deleted, batches=batches, done=False)
+            if cursor == 0:
+                break
+
+        await self._call("invalidate_prefix", prefix)
+        yield dict(prefix=prefix, deleted=deleted, batches=batches, done=True)
+
+    async def delete_keys(self, prefix: str = "", batch_size: int = 500) -> dict:
+        progress = dict(prefix=prefix, deleted=0, batches=0, done=True)
+        async for progress in self.iter_delete_keys(prefix, batch_size):
+            pass
+        return progress
 
     async def delete_all_keys(self):
-        if self._client:
-            async for key in self._client.scan_iter("*"):
-                await self._client.delete(key)
+        await self.delete_keys()
 
-    async def get_all_keys(self):
-        if self._client:
-            keys = await self._client.keys("*")
-            return keys
+    async def get_all_keys(self, prefix: str = "") -> List[bytes]:
+        keys = []
+        cursor = 0
+        while True:
+            cursor, page = await self.scan_keys(prefix, cursor)
+            keys.extend(page)
+            if cursor == 0:
+                return keys
 
     async def gracefully_closing(self):
-        if self._client:
-            await self._client.close()
-            self._client = None
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        for backend in (self._backend, self._fallback):
+            if backend is not None:
+                await backend.close()
+        self._backend = self._fallback = None
+        self._degraded = False
 
     async def is_alive(self) -> bool:
-        is_alive = False
-        test_value = 100
+        """Доступность основного хранилища (PING), без записи"""
 
+        if not self._backend:
+            return False
         try:
-            await self.set_value(key="test_key", value=orjson.dumps(test_value))
-            cached_value = await self.get_value(key="test_key")
-            is_alive = cached_value == test_value
-        except Exception:
-            pass
-        return is_alive
+            return await self._backend.ping()
+        except BACKEND_ERRORS:
+            return False
+
+
+def create_backend(name: str) -> CacheBackend:
+    if name == "memory":
+        return MemoryBackend(
+            LocalCache(
+                max_entries=config.CACHE_MEMORY_MAX_ENTRIES,
+                max_bytes=config.CACHE_MEMORY_MAX_BYTES,
+                ttl_seconds=config.CACHE_MEMORY_MAX_TTL_SECONDS,
+            )
+        )
+
+    redis = RedisBackend(
+        aioredis.from_url(
+            url=config.REDIS_URL,
+            max_connections=config.REDIS_MAX_CONNECTIONS,
+            socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=config.REDIS_SOCKET_CONNECT_TIMEOUT,
+            health_check_interval=config.REDIS_HEALTH_CHECK_INTERVAL,
+        )
+    )
+    if name == "redis":
+        return redis
+    if name == "tiered":
+        return TieredBackend(
+            LocalCache(
+                max_entries=config.CACHE_LOCAL_MAX_ENTRIES,
+                max_bytes=config.CACHE_LOCAL_MAX_BYTES,
+                ttl_seconds=config.CACHE_LOCAL_TTL_SECONDS,
+            ),
+            redis,
+            channel=config.CACHE_INVALIDATION_CHANNEL,
+        )
+    raise ValueError(f"Unknown cache backend: {name}")
+
+
+NEGATIVE_MARKER = "__negative__"
+# запись-заглушка после инвалидации: читается как промах и не дает записать
+# в ключ значение, прочитанное из БД до инвалидации (запись идет с NX)
+TOMBSTONE_MARKER = "__tombstone__"
+# запись stale-while-revalidate: значение и время мягкого истечения
+STALE_MARKER = "__soft_expires_at__"
+
+
+class NegativeEntry(NamedTuple):
+    """
+    Закэшированный "пустой" результат: ошибка 4xx или ответ без данных.
+    Отличается от промаха (None), хранится с собственным коротким TTL.
+    """
+
+    status_code: int
+    detail: Any = None
+
+
+def key_namespace(key: str) -> str:
+    """Пространство имен ключа для метрик: ключ без последней части после "_" """
+
+    return key.rsplit("_", 1)[0]
+
+
+def decode_entry(
+    cache_data: Optional[bytes],
+    namespace: str = "",
+) -> Tuple[Optional[Any], bool]:
+    """Отдает значение и признак того, что его мягкий TTL истек"""
+
+    if not cache_data:
+        cache_metrics.incr(namespace, "miss")
+        return None, False
+
+    value = decode(cache_data)
+    if isinstance(value, dict) and TOMBSTONE_MARKER in value:
+        cache_metrics.incr(namespace, "miss")
+        return None, False
+
+    is_stale = False
+    if isinstance(value, dict) and STALE_MARKER in value:
+        is_stale = value[STALE_MARKER] <= time.time()
+        value = value["value"]
+        if is_stale:
+            cache_metrics.incr(namespace, "stale")
+
+    if isinstance(value, dict) and NEGATIVE_MARKER in value:
+        cache_metrics.incr(namespace, "negative_hit")
+        return NegativeEntry(**value[NEGATIVE_MARKER]), is_stale
+
+    cache_metrics.incr(namespace, "hit")
+    return value, is_stale
+
+
+def decode_value(cache_data: Optional[bytes], namespace: str = "") -> Optional[Any]:
+    return decode_entry(cache_data, namespace)[0]
+
+
+default_codec = get_codec(
+    config.CACHE_CODEC,
+    compression_threshold=config.CACHE_COMPRESSION_THRESHOLD,
+    compression_level=config.CACHE_COMPRESSION_LEVEL,
+)
 
 
 class RedisCacheBaseHandler:
@@ -70,32 +415,105 @@ class RedisCacheBaseHandler:
         base_cache: RedisBaseCache,
         key: str,
         ttl_seconds: Optional[int] = None,
+        negative_ttl_seconds: Optional[int] = None,
+        stale_grace_seconds: Optional[int] = None,
+        namespace: Optional[str] = None,
+        codec: Optional[Codec] = None,
     ):
+        """
+        namespace - разрез метрик, по умолчанию ключ без последней части.
+        codec - сериализация значений, по умолчанию из настроек (CACHE_CODEC).
+        stale_grace_seconds - режим stale-while-revalidate: после ttl_seconds значение
+        считается устаревшим, но еще stale_grace_seconds отдается из кэша, пока
+        оно обновляется в фоне.
+        """
         self.cache: RedisBaseCache = base_cache
         self.key: str = key
         self.ttl_seconds: Optional[int] = ttl_seconds
+        self.negative_ttl_seconds: int = (
+            negative_ttl_seconds or config.CACHE_NEGATIVE_TTL_SECONDS
+        )
+        self.stale_grace_seconds: Optional[int] = stale_grace_seconds
+        self.namespace: str = namespace or key_namespace(key)
+        self.codec: Codec = codec or default_codec
 
     async def set_value(
         self,
         value: Any,
         ttl_seconds: Optional[int] = None,
-    ):
+        only_if_absent: bool = False,
+    ) -> bool:
+        cache_data, ttl_seconds = self.encode(value, ttl_seconds)
+        cache_metrics.observe(self.namespace, "value_size", len(cache_data))
+        with cache_metrics.timer(self.namespace, "set"):
+            return await self.cache.set_value(
+                key=self.key,
+                value=cache_data,
+                ttl_seconds=ttl_seconds,
+                nx=only_if_absent,
+            )
+
+    def encode(
+        self, value: Any, ttl_seconds: Optional[int] = None
+    ) -> Tuple[bytes, int]:
+        """Значение для записи в redis и TTL ключа"""
+
         if self.ttl_seconds is None and ttl_seconds is None:
             raise ValueError("ttl_seconds does not exist")
 
-        await self.cache.set_value(
-            key=self.key,
-            value=orjson.dumps(value),
-            ttl_seconds=ttl_seconds or self.ttl_seconds,
+        ttl_seconds = ttl_seconds or self.ttl_seconds
+        if self.stale_grace_seconds:
+            value = {STALE_MARKER: time.time() + ttl_seconds, "value": value}
+            ttl_seconds += self.stale_grace_seconds
+
+        return self.codec.encode(value), ttl_seconds
+
+    async def set_negative(self, status_code: int, detail: Any = None):
+        await self.set_value(
+            {NEGATIVE_MARKER: dict(status_code=status_code, detail=detail)},
+            ttl_seconds=self.negative_ttl_seconds,
         )
 
+    async def get_entry(self) -> Tuple[Optional[Any], bool]:
+        """Значение (как в get_value) и признак истечения мягкого TTL"""
+
+        with cache_metrics.timer(self.namespace, "get"):
+            cache_data = await self.cache.get_value(
+                key=self.key,
+            )
+        return decode_entry(cache_data, self.namespace)
+
     async def get_value(self) -> Optional[Any]:
-        cache_data = await self.cache.get_value(
-            key=self.key,
-        )
-        ret_value = orjson.loads(cache_data) if cache_data else None
+        """Отдает None при промахе и NegativeEntry для негативной записи"""
+
+        value, _ = await self.get_entry()
+        return value
 
-        return ret_value
+    async def delete_value(self):
+        await self.cache.delete_value(key=self.key)
+
+    async def invalidate(self, guard_seconds: int = 0):
+        """
+        guard_seconds > 0 - вместо удаления ключ на это время занимается заглушкой,
+        чтобы параллельное чтение не вернуло в кэш устаревшее значение
+        (при записи через set_value(only_if_absent=True)).
+        """
+
+        if guard_seconds > 0:
+            await self.cache.set_value(
+                key=self.key,
+                value=self.codec.encode({TOMBSTONE_MARKER: True}),
+                ttl_seconds=guard_seconds,
+            )
+        else:
+            await self.delete_value()
+
+    def lock(self):
+        return self.cache.lock(
+            key=f"{self.key}_lock",
+            timeout=config.CACHE_LOCK_TIMEOUT_SECONDS,
+            blocking_timeout=config.CACHE_LOCK_WAIT_SECONDS,
+        )
 
     async def is_alive(self) -> bool:
         is_alive = False
@@ -113,14 +531,66 @@ class RedisCacheBaseHandler:
         await self.cache.delete_all_keys()
 
     async def get_all_keys(self):
-        return self.cache.get_all_keys()
+        return await self.cache.get_all_keys()
 
 
 base_cache = RedisBaseCache()
 
 
+async def get_values(handlers: List[RedisCacheBaseHandler]) -> List[Optional[Any]]:
+    """Значения нескольких ключей за один запрос в redis (MGET)"""
+
+    namespaces = {handler.namespace for handler in handlers}
+    started = time.perf_counter()
+    try:
+        cache_data = await base_cache.get_many([handler.key for handler in handlers])
+    except Exception:
+        for namespace in namespaces:
+            cache_metrics.incr(namespace, "get_error")
+        raise
+    finally:
+        # один запрос на пачку: задержка учитывается по разу в каждом разрезе
+        elapsed = time.perf_counter() - started
+        for namespace in namespaces:
+            cache_metrics.incr(namespace, "get")
+            cache_metrics.observe(namespace, "get_latency", elapsed)
+
+    return [
+        decode_value(data, handler.namespace)
+        for handler, data in zip(handlers, cache_data)
+    ]
+
+
+async def set_values(items: List[Tuple[RedisCacheBaseHandler, Any]]):
+    """Запись нескольких значений за один запрос в redis (pipeline)"""
+
+    encoded = []
+    for handler, value in items:
+        cache_data, ttl_seconds = handler.encode(value)
+        cache_metrics.observe(handler.namespace, "value_size", len(cache_data))
+        encoded.append((handler.key, cache_data, ttl_seconds))
+
+    await base_cache.set_many(encoded)
+
+
+async def delete_values(handlers: List[RedisCacheBaseHandler]):
+    await base_cache.delete_many([handler.key for handler in handlers])
+
+
 def get_handler(
     key: str,
     ttl_seconds: Optional[int] = None,
+    negative_ttl_seconds: Optional[int] = None,
+    stale_grace_seconds: Optional[int] = None,
+    namespace: Optional[str] = None,
+    codec: Optional[Codec] = None,
 ) -> RedisCacheBaseHandler:
-    return RedisCacheBaseHandler(base_cache, key, ttl_seconds)
+    return RedisCacheBaseHandler(
+        base_cache,
+        key,
+        ttl_seconds,
+        negative_ttl_seconds,
+        stale_grace_seconds,
+        namespace,
+        codec,
+    )
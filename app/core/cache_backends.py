@@ -0,0 +1,321 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+import asyncio
+import uuid
+
+from aioredis.client import Redis as RedisClient
+from aioredis.exceptions import RedisError
+from orjson import orjson
+
+from app.core.local_cache import LocalCache
+
+
+# ошибки, при которых хранилище считается недоступным
+BACKEND_ERRORS = (RedisError, OSError, asyncio.TimeoutError)
+
+
+def escape_pattern(prefix: str) -> str:
+    """Экранирует спецсимволы glob-шаблона redis (MATCH)"""
+
+    return "".join(f"\\{char}" if char in "*?[]\\" else char for char in prefix)
+
+
+class CacheBackend:
+    """Хранилище значений кэша (байты с TTL)"""
+
+    name: str
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        raise NotImplementedError
+
+    async def set(
+        self, key: str, value: bytes, ttl_seconds: int, nx: bool = False
+    ) -> bool:
+        """nx - записать, только если ключа нет. Отдает признак записи"""
+
+        raise NotImplementedError
+
+    async def set_many(self, items: List[Tuple[str, bytes, int]]):
+        raise NotImplementedError
+
+    async def delete_many(self, keys: List[str]) -> int:
+        raise NotImplementedError
+
+    async def scan(
+        self, prefix: str, cursor: int, count: int
+    ) -> Tuple[int, List[bytes]]:
+        raise NotImplementedError
+
+    async def invalidate_prefix(self, prefix: str):
+        """Вызывается после удаления ключей с префиксом, для сброса копий"""
+
+    @asynccontextmanager
+    async def lock(
+        self, key: str, timeout: float, blocking_timeout: float
+    ) -> AsyncIterator[bool]:
+        """Блокировка между воркерами; без нее отдает False"""
+
+        yield False
+
+    async def ping(self) -> bool:
+        return True
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def get_stats(self) -> dict:
+        return dict(backend=self.name)
+
+
+class RedisBackend(CacheBackend):
+    name = "redis"
+
+    def __init__(self, client: RedisClient):
+        self.client = client
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if len(keys) == 1:
+            return [await self.client.get(keys[0])]
+        return await self.client.mget(keys)
+
+    async def get_with_ttl(
+        self, keys: List[str]
+    ) -> List[Tuple[Optional[bytes], Optional[float]]]:
+        """Значения и оставшийся TTL в секундах за один запрос"""
+
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+            pipe.pttl(key)
+        result = await pipe.execute()
+        return [
+            (value, pttl / 1000 if pttl > 0 else None)
+            for value, pttl in zip(result[::2], result[1::2])
+        ]
+
+    async def set(
+        self, key: str, value: bytes, ttl_seconds: int, nx: bool = False
+    ) -> bool:
+        return bool(await self.client.set(name=key, value=value, ex=ttl_seconds, nx=nx))
+
+    async def set_many(self, items: List[Tuple[str, bytes, int]]):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value, ttl_seconds in items:
+            pipe.set(name=key, value=value, ex=ttl_seconds)
+        await pipe.execute()
+
+    async def delete_many(self, keys: List[str]) -> int:
+        return await self.client.unlink(*keys)
+
+    async def scan(
+        self, prefix: str, cursor: int, count: int
+    ) -> Tuple[int, List[bytes]]:
+        return await self.client.scan(
+            cursor=cursor,
+            match=f"{escape_pattern(prefix)}*",
+            count=count,
+        )
+
+    @asynccontextmanager
+    async def lock(
+        self, key: str, timeout: float, blocking_timeout: float
+    ) -> AsyncIterator[bool]:
+        redis_lock = self.client.lock(
+            name=key,
+            timeout=timeout,
+            blocking_timeout=blocking_timeout,
+            thread_local=False,
+        )
+        try:
+            acquired = await redis_lock.acquire()
+        except RedisError:
+            acquired = False
+
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    await redis_lock.release()
+                except RedisError:
+                    # блокировка уже истекла по timeout
+                    pass
+
+    async def ping(self) -> bool:
+        return bool(await self.client.ping())
+
+    async def close(self):
+        await self.client.close()
+
+    def get_stats(self) -> dict:
+        pool = self.client.connection_pool
+        return dict(
+            backend=self.name,
+            max_connections=pool.max_connections,
+            created=pool._created_connections,
+            in_use=len(pool._in_use_connections),
+            idle=len(pool._available_connections),
+        )
+
+
+class MemoryBackend(CacheBackend):
+    """Ограниченное по размеру хранилище в памяти процесса (LRU)"""
+
+    name = "memory"
+
+    def __init__(self, local_cache: LocalCache):
+        self.local = local_cache
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [self.local.get(key) for key in keys]
+
+    async def set(
+        self, key: str, value: bytes, ttl_seconds: int, nx: bool = False
+    ) -> bool:
+        if nx and key in self.local:
+            return False
+        self.local.set(key, value, ttl_seconds)
+        return True
+
+    async def set_many(self, items: List[Tuple[str, bytes, int]]):
+        for key, value, ttl_seconds in items:
+            self.local.set(key, value, ttl_seconds)
+
+    async def delete_many(self, keys: List[str]) -> int:
+        return sum(self.local.delete(key) for key in keys)
+
+    async def scan(
+        self, prefix: str, cursor: int, count: int
+    ) -> Tuple[int, List[bytes]]:
+        # ключей немного (ограничены размером), отдаются одной страницей
+        return 0, [key.encode("utf8") for key in self.local.keys(prefix)]
+
+    async def close(self):
+        self.local.clear()
+
+    def get_stats(self) -> dict:
+        return dict(backend=self.name, **self.local.get_stats())
+
+
+class TieredBackend(CacheBackend):
+    """
+    L1 в памяти процесса перед redis. При записи и удалении копии в других
+    воркерах сбрасываются через pub/sub канал.
+    """
+
+    name = "tiered"
+
+    def __init__(self, local_cache: LocalCache, remote: RedisBackend, channel: str):
+        self.local = local_cache
+        self.remote = remote
+        self.channel = channel
+        self.instance_id: str = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        values = {key: self.local.get(key) for key in keys}
+        missed = [key for key, value in values.items() if value is None]
+        if missed:
+            result = await self.remote.get_with_ttl(missed)
+            for key, (value, ttl_seconds) in zip(missed, result):
+                if value is not None:
+                    self.local.set(key, value, ttl_seconds)
+                values[key] = value
+        return [values[key] for key in keys]
+
+    async def set(
+        self, key: str, value: bytes, ttl_seconds: int, nx: bool = False
+    ) -> bool:
+        stored = await self.remote.set(key, value, ttl_seconds, nx)
+        if stored:
+            self.local.set(key, value, ttl_seconds)
+            await self._publish_invalidation([key])
+        return stored
+
+    async def set_many(self, items: List[Tuple[str, bytes, int]]):
+        await self.remote.set_many(items)
+        for key, value, ttl_seconds in items:
+            self.local.set(key, value, ttl_seconds)
+        await self._publish_invalidation([key for key, _, _ in items])
+
+    async def delete_many(self, keys: List[str]) -> int:
+        deleted = await self.remote.delete_many(keys)
+        for key in keys:
+            self.local.delete(key)
+        await self._publish_invalidation(keys)
+        return deleted
+
+    async def scan(
+        self, prefix: str, cursor: int, count: int
+    ) -> Tuple[int, List[bytes]]:
+        return await self.remote.scan(prefix, cursor, count)
+
+    async def invalidate_prefix(self, prefix: str):
+        self.local.delete_prefix(prefix)
+        await self._publish_invalidation(prefixes=[prefix])
+
+    def lock(self, key: str, timeout: float, blocking_timeout: float):
+        return self.remote.lock(key, timeout, blocking_timeout)
+
+    async def ping(self) -> bool:
+        return await self.remote.ping()
+
+    async def _publish_invalidation(
+        self, keys: List[str] = (), prefixes: List[str] = ()
+    ):
+        # сброс по префиксу - отдельное поле: ключ может сам оканчиваться на "*"
+        message = orjson.dumps(
+            dict(sender=self.instance_id, keys=list(keys), prefixes=list(prefixes))
+        )
+        await self.remote.client.publish(self.channel, message)
+
+    def handle_invalidation(self, message: bytes):
+        data = orjson.loads(message)
+        if data["sender"] == self.instance_id:
+            return
+        for key in data.get("keys", ()):
+            self.local.delete(key)
+        for prefix in data.get("prefixes", ()):
+            self.local.delete_prefix(prefix)
+
+    async def _listen_invalidations(self):
+        while True:
+            pubsub = self.remote.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                while True:
+                    # ожидание с таймаутом, чтобы не упираться в socket_timeout
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message is not None:
+                        self.handle_invalidation(message["data"])
+            except BACKEND_ERRORS:
+                # пока не были подписаны, могли пропустить инвалидацию
+                self.local.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    async def start(self):
+        self._listener = asyncio.create_task(self._listen_invalidations())
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        self.local.clear()
+        await self.remote.close()
+
+    def get_stats(self) -> dict:
+        return dict(
+            backend=self.name,
+            local=self.local.get_stats(),
+            remote=self.remote.get_stats(),
+        )
@@ -0,0 +1,133 @@
+from datetime import date
+from datetime import datetime
+from datetime import time
+from typing import Any
+from typing import Dict
+from uuid import UUID
+import zlib
+
+from orjson import orjson
+import msgpack
+
+
+# Формат значения в кэше: HEADER + тег кодека (1 байт) + данные.
+# Значения без заголовка записаны до появления кодеков и читаются как orjson;
+# JSON не может начинаться с нулевого байта, поэтому форматы не пересекаются.
+HEADER = b"\x00"
+
+
+class CodecError(Exception):
+    pass
+
+
+class Codec:
+    """Сериализация значений кэша. tag сохраняется вместе со значением"""
+
+    tag: bytes
+    name: str
+
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+    def encode(self, value: Any) -> bytes:
+        return HEADER + self.tag + self.dumps(value)
+
+
+class OrjsonCodec(Codec):
+    tag = b"j"
+    name = "orjson"
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+def _msgpack_default(value: Any) -> Any:
+    # те же типы и то же представление, что и у orjson
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Type is not msgpack serializable: {type(value).__name__}")
+
+
+class MsgpackCodec(Codec):
+    tag = b"m"
+    name = "msgpack"
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_msgpack_default)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data)
+
+
+class CompressedCodec(Codec):
+    """
+    Сжимает (zlib) значения длиннее threshold байт, более короткие
+    записываются кодеком inner без сжатия - с его тегом.
+    """
+
+    tag = b"z"
+
+    def __init__(self, inner: Codec, threshold: int = 1024, level: int = 1):
+        self.inner = inner
+        self.threshold = threshold
+        self.level = level
+        self.name = f"{inner.name}+zlib"
+
+    def encode(self, value: Any) -> bytes:
+        data = self.inner.encode(value)
+        if len(data) <= self.threshold:
+            return data
+        return HEADER + self.tag + zlib.compress(data, self.level)
+
+    def dumps(self, value: Any) -> bytes:
+        return zlib.compress(self.inner.encode(value), self.level)
+
+    def loads(self, data: bytes) -> Any:
+        return decode(zlib.decompress(data))
+
+
+CODECS: Dict[bytes, Codec] = {
+    codec.tag: codec for codec in (OrjsonCodec(), MsgpackCodec())
+}
+CODECS[CompressedCodec.tag] = CompressedCodec(CODECS[OrjsonCodec.tag])
+
+
+def decode(data: bytes) -> Any:
+    """Декодирует значение любым кодеком по тегу, независимо от текущего кодека"""
+
+    if not data.startswith(HEADER):
+        return orjson.loads(data)
+
+    codec = CODECS.get(data[1:2])
+    if codec is None:
+        raise CodecError(f"Unknown cache codec tag: {data[1:2]!r}")
+    return codec.loads(data[2:])
+
+
+def get_codec(
+    name: str,
+    compression_threshold: int = 0,
+    compression_level: int = 1,
+) -> Codec:
+    """compression_threshold <= 0 - без сжатия"""
+
+    codecs = {
+        codec.name: codec
+        for codec in CODECS.values()
+        if not isinstance(codec, CompressedCodec)
+    }
+    if name not in codecs:
+        raise CodecError(f"Unknown cache codec: {name}")
+
+    codec = codecs[name]
+    if compression_threshold > 0:
+        codec = CompressedCodec(codec, compression_threshold, compression_level)
+    return codec
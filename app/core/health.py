@@ -0,0 +1,102 @@
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+import asyncio
+import time
+
+from app.core.settings import config
+from app.core.singleflight import SingleFlight
+
+
+class HealthCheck:
+    """
+    Проверка одного компонента. Результат кэшируется на cache_seconds,
+    одновременные пробы объединяются в один вызов check.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        check: Callable[[], Awaitable[bool]],
+        timeout_seconds: float,
+        cache_seconds: float,
+        critical: bool = True,
+    ):
+        self.name = name
+        self.check = check
+        self.timeout_seconds = timeout_seconds
+        self.cache_seconds = cache_seconds
+        self.critical = critical
+
+        self._result: Optional[dict] = None
+        self._checked_at: float = 0.0
+        self._calls = SingleFlight()
+
+    async def run(self) -> dict:
+        if (
+            self._result is not None
+            and time.monotonic() - self._checked_at < self.cache_seconds
+        ):
+            return self._result
+        return await self._calls.do(self.name, self._run)
+
+    async def _run(self) -> dict:
+        started = time.monotonic()
+        error = None
+        try:
+            alive = bool(
+                await asyncio.wait_for(self.check(), timeout=self.timeout_seconds)
+            )
+        except asyncio.TimeoutError:
+            alive, error = False, f"timeout {self.timeout_seconds}s"
+        except Exception as e:
+            alive, error = False, f"{type(e).__name__}: {e}"
+
+        self._checked_at = time.monotonic()
+        self._result = dict(
+            component=self.name,
+            alive=alive,
+            critical=self.critical,
+            latency_ms=round((self._checked_at - started) * 1000, 2),
+            error=error,
+        )
+        return self._result
+
+
+class HealthChecker:
+    def __init__(self, timeout_seconds: float, cache_seconds: float):
+        self.timeout_seconds = timeout_seconds
+        self.cache_seconds = cache_seconds
+        self.checks: Dict[str, HealthCheck] = {}
+
+    def register(
+        self,
+        name: str,
+        check: Callable[[], Awaitable[bool]],
+        critical: bool = True,
+        timeout_seconds: Optional[float] = None,
+    ):
+        self.checks[name] = HealthCheck(
+            name=name,
+            check=check,
+            timeout_seconds=timeout_seconds or self.timeout_seconds,
+            cache_seconds=self.cache_seconds,
+            critical=critical,
+        )
+
+    async def readiness(self) -> dict:
+        """ready=False, если недоступен хотя бы один критичный компонент"""
+
+        components: List[dict] = await asyncio.gather(
+            *(check.run() for check in self.checks.values())
+        )
+        ready = all(item["alive"] for item in components if item["critical"])
+        return dict(ready=ready, components=components)
+
+
+health_checker = HealthChecker(
+    timeout_seconds=config.HEALTHCHECK_TIMEOUT_SECONDS,
+    cache_seconds=config.HEALTHCHECK_CACHE_SECONDS,
+)
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from typing import List
+from typing import Optional
+from typing import Tuple
+import time
+
+
+class LocalCache:
+    """
+    Кэш в памяти процесса (L1) перед redis: LRU с TTL и ограничением
+    по количеству записей и суммарному размеру значений в байтах.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._data: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            self.delete(key)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes, ttl_seconds: Optional[float] = None):
+        """ttl_seconds - оставшийся TTL ключа в redis, L1 не хранит значение дольше"""
+
+        self.delete(key)
+
+        ttl = self.ttl_seconds
+        if ttl_seconds is not None:
+            ttl = min(ttl, ttl_seconds)
+        if ttl <= 0 or len(value) > self.max_bytes:
+            return
+
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._bytes += len(value)
+
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            _, (evicted, _) = self._data.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        item = self._data.pop(key, None)
+        if item is None:
+            return False
+        self._bytes -= len(item[0])
+        return True
+
+    def delete_prefix(self, prefix: str):
+        for key in [key for key in self._data if key.startswith(prefix)]:
+            self.delete(key)
+
+    def keys(self, prefix: str = "") -> List[str]:
+        now = time.monotonic()
+        return [
+            key
+            for key, (_, expires_at) in self._data.items()
+            if key.startswith(prefix) and expires_at > now
+        ]
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def __contains__(self, key: str) -> bool:
+        """Есть ли живое значение, без учета в статистике"""
+
+        item = self._data.get(key)
+        return item is not None and item[1] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_stats(self) -> dict:
+        return dict(
+            entries=len(self._data),
+            bytes=self._bytes,
+            max_entries=self.max_entries,
+            max_bytes=self.max_bytes,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
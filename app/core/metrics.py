@@ -0,0 +1,137 @@
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict
+from typing import Iterator
+from typing import Sequence
+import time
+
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин (значение <= границы)"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Оценка сверху: граница корзины, в которую попадает квантиль"""
+
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float("inf")
+
+    def get_stats(self) -> dict:
+        return dict(
+            count=self.count,
+            sum=self.sum,
+            avg=self.sum / self.count if self.count else 0.0,
+            p50=self.quantile(0.5),
+            p95=self.quantile(0.95),
+            p99=self.quantile(0.99),
+            buckets={
+                **{
+                    str(bound): count for bound, count in zip(self.buckets, self.counts)
+                },
+                "+Inf": self.counts[-1],
+            },
+        )
+
+
+class NamespaceMetrics:
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.histograms: Dict[str, Histogram] = dict(
+            get_latency=Histogram(LATENCY_BUCKETS),
+            set_latency=Histogram(LATENCY_BUCKETS),
+            upstream_latency=Histogram(LATENCY_BUCKETS),
+            value_size=Histogram(SIZE_BUCKETS),
+        )
+
+    def get_stats(self) -> dict:
+        counters = self.counters
+        hits = counters.get("hit", 0) + counters.get("negative_hit", 0)
+        lookups = hits + counters.get("miss", 0)
+        return dict(
+            counters=dict(self.counters),
+            hit_ratio=hits / lookups if lookups else None,
+            **{name: hist.get_stats() for name, hist in self.histograms.items()},
+        )
+
+
+class CacheMetrics:
+    """
+    Счетчики и гистограммы кэша в разрезе пространства имен ключа
+    (префикса, например my_project_get_country_info).
+    """
+
+    def __init__(self):
+        self.namespaces: Dict[str, NamespaceMetrics] = defaultdict(NamespaceMetrics)
+
+    def incr(self, namespace: str, event: str, count: int = 1):
+        self.namespaces[namespace].counters[event] += count
+
+    def observe(self, namespace: str, histogram: str, value: float):
+        self.namespaces[namespace].histograms[histogram].observe(value)
+
+    @contextmanager
+    def timer(self, namespace: str, operation: str) -> Iterator[None]:
+        """
+        Замеряет длительность в гистограмму <operation>_latency и считает
+        вызовы <operation> и ошибки <operation>_error.
+        """
+
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.incr(namespace, f"{operation}_error")
+            raise
+        finally:
+            self.incr(namespace, operation)
+            self.observe(
+                namespace, f"{operation}_latency", time.perf_counter() - started
+            )
+
+    def get_stats(self) -> dict:
+        return {
+            namespace: metrics.get_stats()
+            for namespace, metrics in sorted(self.namespaces.items())
+        }
+
+    def reset(self):
+        self.namespaces.clear()
+
+
+cache_metrics = CacheMetrics()
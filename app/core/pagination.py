@@ -0,0 +1,27 @@
+from typing import Any
+from typing import Type
+import base64
+
+from orjson import orjson
+
+
+def encode_cursor(value: Any) -> str:
+    """Непрозрачный курсор keyset-пагинации из значения ключа последней записи"""
+
+    return base64.urlsafe_b64encode(orjson.dumps(value)).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, value_type: Type = str) -> Any:
+    """
+    Поднимает ValueError для невалидного курсора, в том числе если значение
+    не value_type (тип ключа пагинации) - иначе ошибка была бы уже в БД
+    """
+
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        value = orjson.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Невалидный курсор") from e
+    if not isinstance(value, value_type):
+        raise ValueError("Невалидный курсор")
+    return value
@@ -0,0 +1,37 @@
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+import asyncio
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные вызовы с одинаковым ключом в один.
+    Первый вызов запускает корутину, остальные ждут её результат (или исключение).
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        # shield - отмена одного из ожидающих не отменяет общий вызов
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # помечаем исключение как полученное, если все ожидающие были отменены
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+request_coalescer = SingleFlight()
@@ -1,34 +1,148 @@
+from functools import partial
 from typing import Any
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
 from typing import Dict
+from typing import Hashable
 from typing import List
+from typing import Mapping
 from typing import Optional
+from typing import Sequence
+from typing import Tuple
 from typing import Type
 from typing import TypeVar
 
+from orjson import orjson
+from sqlalchemy import bindparam
 from sqlalchemy import delete
 from sqlalchemy import func
+from sqlalchemy import or_
 from sqlalchemy import select
+from sqlalchemy import tuple_
 from sqlalchemy import update
+from sqlalchemy.engine import RowMapping
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Executable
 from sqlalchemy.sql import Select
 
 from app.db.setup import Base
 from app.db.setup import maybe_session
+from app.db.setup import on_commit
+from app.db.setup import run_on_commit
 from app.models.domain.base import AnyDomainModel
 
 
 ModelType = TypeVar("ModelType", bound=Base)
+ChangeHook = Callable[[List[Dict[str, Any]]], Awaitable[None]]
 
 
 class Repository:
 
-    def __init__(self, model: Type[ModelType], domain_model: Type[AnyDomainModel]):
+    def __init__(
+        self,
+        model: Type[ModelType],
+        domain_model: Type[AnyDomainModel],
+        on_change: Optional[ChangeHook] = None,
+        tracked_columns: Sequence[str] = (),
+        trusted_reads: bool = False,
+    ):
+        """
+        on_change вызывается при изменении записей (например, для инвалидации кэша)
+        со списком значений tracked_columns затронутых записей - до и после изменения.
+
+        Чтение идет через Core: выбираются только колонки, которые есть в доменной
+        модели, без ORM-объектов. trusted_reads - доменные объекты из строк БД
+        создаются без валидации (construct), можно переопределить в вызове (trusted).
+
+        Запросы read/update/delete и выборки по фильтрам собираются один раз на
+        (операцию, набор колонок) с bindparam вместо значений и переиспользуются:
+        у них один ключ в кэше скомпилированного SQL движка и один текст для
+        кэша подготовленных выражений asyncpg.
+        """
         self.model = model
         self.domain_model = domain_model
+        self.on_change = on_change
+        self.tracked_columns = tuple(tracked_columns)
+        self.trusted_reads = trusted_reads
+        self.columns = [
+            column
+            for column in model.__table__.columns
+            if column.key in domain_model.__fields__
+        ]
+        self._statements: Dict[Hashable, Executable] = {}
+
+    def _tracked(self):
+        return [getattr(self.model, column) for column in self.tracked_columns]
+
+    def _notify(self, session: AsyncSession, rows: List[Dict[str, Any]]):
+        """on_change - после фиксации транзакции, когда изменения видны всем"""
+
+        rows = [
+            {column: row[column] for column in self.tracked_columns if column in row}
+            for row in rows
+        ]
+        # строки без отслеживаемых колонок (обновлены другие поля) не нужны
+        rows = [row for row in rows if row]
+        if self.on_change and rows:
+            on_commit(session, partial(self.on_change, rows))
+
+    def _to_domain(
+        self, row: Mapping[str, Any], trusted: Optional[bool] = None
+    ) -> AnyDomainModel:
+        if self.trusted_reads if trusted is None else trusted:
+            return self.domain_model.construct(**row)
+        return self.domain_model(**row)
 
-    def make_search_query(self, **kwargs: Dict) -> Select:
-        q = select(self.model)
+    def _statement(self, key: Hashable, build: Callable[[], Executable]) -> Executable:
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = self._statements[key] = build()
+        return statement
+
+    def _select(
+        self,
+        filters: Dict[str, Any],
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[Any] = None,
+    ) -> Tuple[Executable, Dict[str, Any]]:
+        """
+        Выборка колонок доменной модели по фильтрам (значение-список - IN)
+        из кэша запросов и параметры для нее
+        """
+
+        signature = tuple(
+            (key, isinstance(value, list)) for key, value in filters.items()
+        )
+        key = ("select", signature, order_by, limit is not None, after is not None)
+
+        def build():
+            q = select(*self.columns)
+            for name, many in signature:
+                column = getattr(self.model, name)
+                if many:
+                    q = q.where(column.in_(bindparam(f"f_{name}", expanding=True)))
+                else:
+                    q = q.where(column == bindparam(f"f_{name}"))
+            if order_by is not None:
+                q = q.order_by(getattr(self.model, order_by))
+            if after is not None:
+                q = q.where(getattr(self.model, order_by) > bindparam("after"))
+            if limit is not None:
+                q = q.limit(bindparam("limit"))
+            return q
+
+        params = {f"f_{name}": value for name, value in filters.items()}
+        if after is not None:
+            params["after"] = after
+        if limit is not None:
+            params["limit"] = limit
+        return self._statement(key, build), params
+
+    def _filter(self, q: Select, **kwargs: Dict) -> Select:
         for key, value in kwargs.items():
             if isinstance(value, list):
                 q = q.where(getattr(self.model, key).in_(value))
@@ -36,46 +150,232 @@ class Repository:
                 q = q.where(getattr(self.model, key) == value)
         return q
 
+    def make_search_query(self, **kwargs: Dict) -> Select:
+        return self._filter(select(self.model), **kwargs)
+
+    def make_columns_query(self, **kwargs: Dict) -> Select:
+        """Как make_search_query, но только колонки доменной модели (Core)"""
+
+        return self._filter(select(*self.columns), **kwargs)
+
     @maybe_session
     async def create(self, session: AsyncSession, **kwargs: Dict) -> AnyDomainModel:
-        instance = self.model(**kwargs)
-        session.add(instance)
-        await session.flush()
-        return self.domain_model(**instance.__dict__)
+        """
+        Один INSERT ... RETURNING. При нарушении уникальности поднимает
+        sqlalchemy.exc.IntegrityError, имя ограничения - violated_constraint.
+        """
+
+        statement = (
+            insert(self.model).values(**kwargs).returning(*self.model.__table__.columns)
+        )
+        row = (await session.execute(statement)).mappings().one()
+        self._notify(session, [row])
+        return self.domain_model(**row)
 
     @maybe_session
-    async def read(self, pk: str, value: Any, session: AsyncSession) -> AnyDomainModel:
+    async def bulk_create(
+        self,
+        rows: List[Dict],
+        session: AsyncSession,
+        chunk_size: int = 1000,
+        skip_conflicts: bool = False,
+    ) -> List[AnyDomainModel]:
+        """
+        Многострочный INSERT ... RETURNING пачками по chunk_size строк.
+        skip_conflicts - строки, нарушающие уникальность, пропускаются
+        (ON CONFLICT DO NOTHING) и не попадают в результат.
+        """
+
+        created = []
+        for start in range(0, len(rows), chunk_size):
+            statement = (
+                insert(self.model)
+                .values(rows[start : start + chunk_size])
+                .returning(*self.model.__table__.columns)
+            )
+            if skip_conflicts:
+                statement = statement.on_conflict_do_nothing()
+            result = await session.execute(statement)
+            created.extend(result.mappings().all())
+
+        self._notify(session, created)
+        return [self.domain_model(**row) for row in created]
+
+    @maybe_session(read_only=True)
+    async def read(
+        self,
+        pk: str,
+        value: Any,
+        session: AsyncSession,
+        trusted: Optional[bool] = None,
+    ) -> AnyDomainModel:
         """Может поднять sqlalchemy.exc.NoResultFound"""
 
-        query = select(self.model).where(getattr(self.model, pk) == value)
-        instance = await exactly_one(session, query)
-        return self.domain_model(**instance.__dict__)
+        query, params = self._select({pk: value})
+        row = (await session.execute(query, params)).mappings().one()
+        return self._to_domain(row, trusted)
 
     @maybe_session
     async def update(self, pk: str, session: AsyncSession, **kwargs: Any) -> None:
-        q = (
-            update(self.model)
-            .where(getattr(self.model, pk) == kwargs[pk])
-            .values(**kwargs)
-        )
-        result = await session.execute(q)
+        old_rows = []
+        if self.on_change and set(self.tracked_columns) & set(kwargs):
+            # старые значения отслеживаемых колонок, которые сейчас изменятся
+            query = self._statement(
+                ("tracked", pk),
+                lambda: select(*self._tracked()).where(
+                    getattr(self.model, pk) == bindparam("pk")
+                ),
+            )
+            old = await session.execute(query, {"pk": kwargs[pk]})
+            old_rows = old.mappings().all()
+
+        def build():
+            q = (
+                update(self.model)
+                .where(getattr(self.model, pk) == bindparam("pk"))
+                .values({name: bindparam(f"v_{name}") for name in kwargs})
+            )
+            if self.on_change:
+                q = q.returning(*self._tracked())
+            return q
+
+        q = self._statement(("update", pk, tuple(kwargs)), build)
+        params = {f"v_{name}": value for name, value in kwargs.items()}
+        result = await session.execute(q, {"pk": kwargs[pk], **params})
         assert (
             result.rowcount == 1
         ), f"Rowcount is {result.rowcount} instead of 1. All changes are rolled back!"
+        if self.on_change:
+            self._notify(session, [*old_rows, *result.mappings().all()])
 
     @maybe_session
     async def delete(self, pk: str, value: Any, session: AsyncSession) -> None:
         """Может поднять sqlalchemy.exc.NoResultFound"""
 
-        query = delete(self.model).where(getattr(self.model, pk) == value)
-        await session.execute(query)
+        def build():
+            q = delete(self.model).where(getattr(self.model, pk) == bindparam("pk"))
+            if self.on_change:
+                q = q.returning(*self._tracked())
+            return q
+
+        query = self._statement(("delete", pk), build)
+        result = await session.execute(query, {"pk": value})
+        if self.on_change:
+            self._notify(session, result.mappings().all())
         await session.commit()
+        await run_on_commit(session)
 
-    @maybe_session
-    async def read_many(self, session: AsyncSession, **kwargs) -> List[ModelType]:
-        q = self.make_search_query(**kwargs)
-        records = await get_list(session, q)
-        return [self.domain_model(**x.__dict__) for x in records]
+    @maybe_session(read_only=True)
+    async def read_many(
+        self,
+        session: AsyncSession,
+        trusted: Optional[bool] = None,
+        **kwargs,
+    ) -> List[AnyDomainModel]:
+        rows = await get_rows(session, *self._select(kwargs))
+        return [self._to_domain(row, trusted) for row in rows]
+
+    @maybe_session(read_only=True)
+    async def read_page(
+        self,
+        session: AsyncSession,
+        order_by: str,
+        limit: int,
+        after: Optional[Any] = None,
+        trusted: Optional[bool] = None,
+        **kwargs,
+    ) -> Tuple[List[AnyDomainModel], Optional[Any]]:
+        """
+        Страница по ключу (keyset): записи с order_by > after по возрастанию.
+        Отдает записи и значение order_by последней из них, если есть следующая
+        страница (иначе None). order_by - индексированная уникальная колонка.
+        """
+
+        rows = await get_rows(
+            session, *self._select(kwargs, order_by, limit + 1, after)
+        )
+        items = [self._to_domain(row, trusted) for row in rows[:limit]]
+        next_after = rows[limit - 1][order_by] if len(rows) > limit else None
+        return items, next_after
+
+    async def stream(
+        self,
+        session: AsyncSession,
+        order_by: str,
+        chunk_size: int = 1000,
+        trusted: Optional[bool] = None,
+        **kwargs,
+    ) -> AsyncIterator[AnyDomainModel]:
+        """
+        Все записи через серверный курсор: в памяти не больше chunk_size строк.
+        Сессия должна быть открыта на все время чтения.
+        """
+
+        query, params = self._select(kwargs, order_by)
+        result = await session.stream(
+            query, params, execution_options=dict(yield_per=chunk_size)
+        )
+        async for row in result.mappings():
+            yield self._to_domain(row, trusted)
+
+    def _search(
+        self, q: str, fuzzy: Sequence[str], contains: Sequence[str], limit: int
+    ) -> Tuple[Executable, Dict[str, Any]]:
+        """Запрос нечеткого поиска из кэша запросов и параметры для него"""
+
+        def build():
+            query = bindparam("q")
+            matches, ranks = [], []
+            for name in fuzzy:
+                column = getattr(self.model, name)
+                matches.append(column.op("%")(query))
+                ranks.append(func.similarity(column, query))
+            for name in contains:
+                column = func.lower(getattr(self.model, name))
+                matches.append(column.like(bindparam("pattern"), escape="/"))
+                ranks.append(func.similarity(column, query))
+            return (
+                select(*self.columns)
+                .where(or_(*matches))
+                # similarity от NULL - NULL, greatest его пропускает
+                .order_by(
+                    func.greatest(*ranks).desc(),
+                    *self.model.__table__.primary_key.columns,
+                )
+                .limit(bindparam("limit"))
+            )
+
+        statement = self._statement(("search", tuple(fuzzy), tuple(contains)), build)
+        q = q.lower()
+        pattern = "%{}%".format(
+            q.replace("/", "//").replace("%", "/%").replace("_", "/_")
+        )
+        return statement, dict(q=q, pattern=pattern, limit=limit)
+
+    @maybe_session(read_only=True)
+    async def search(
+        self,
+        q: str,
+        session: AsyncSession,
+        fuzzy: Sequence[str] = (),
+        contains: Sequence[str] = (),
+        limit: int = 20,
+        trusted: Optional[bool] = None,
+    ) -> List[AnyDomainModel]:
+        """
+        Нечеткий поиск (pg_trgm), лучшие совпадения первыми. fuzzy - колонки,
+        похожие на q (оператор %), contains - колонки, содержащие q без учета
+        регистра (lower(col) LIKE). Для каждой колонки нужен GIN-индекс
+        gin_trgm_ops (для contains - по lower(col)), иначе будет seq scan;
+        в q от 3 символов, чтобы по нему были триграммы.
+        """
+
+        rows = await get_rows(session, *self._search(q, fuzzy, contains, limit))
+        return [self._to_domain(row, trusted) for row in rows]
+
+    @maybe_session(read_only=True)
+    async def estimate_count(self, session: AsyncSession, **kwargs) -> int:
+        return await get_estimated_rows(session, self.make_search_query(**kwargs))
 
     @maybe_session
     async def upsert(
@@ -93,11 +393,74 @@ class Repository:
             insert(self.model)
             .values(**data)
             .on_conflict_do_update(constraint=constraint, set_=data)
+            .returning(*self.columns)
+        )
+        row = (await session.execute(statement)).mappings().one()
+
+        self._notify(session, [data, row])
+        return self._to_domain(row)
+
+    @maybe_session
+    async def bulk_upsert(
+        self,
+        rows: List[Dict],
+        conflict_cols: Sequence[str],
+        session: AsyncSession,
+        chunk_size: int = 1000,
+    ) -> List[AnyDomainModel]:
+        """
+        INSERT ... ON CONFLICT (conflict_cols) DO UPDATE ... RETURNING пачками
+        по chunk_size строк: один запрос executemany на пачку, значения
+        собираются в многострочный VALUES (insertmanyvalues). Порядок
+        результата не совпадает с порядком rows.
+
+        У всех строк одинаковый набор колонок; колонки вне conflict_cols
+        обновляются. Повторы по conflict_cols схлопываются, побеждает последняя.
+        """
+
+        if not rows:
+            return []
+
+        conflict_cols = tuple(conflict_cols)
+        names = tuple(rows[0])
+
+        def conflict_key(row: Dict) -> tuple:
+            return tuple(row[name] for name in conflict_cols)
+
+        rows = list({conflict_key(row): row for row in rows}.values())
+
+        def build():
+            q = insert(self.model)
+            update_cols = [name for name in names if name not in conflict_cols]
+            if update_cols:
+                q = q.on_conflict_do_update(
+                    index_elements=conflict_cols,
+                    set_={name: q.excluded[name] for name in update_cols},
+                )
+            else:
+                q = q.on_conflict_do_nothing(index_elements=conflict_cols)
+            return q.returning(*self.columns)
+
+        statement = self._statement(("upsert", conflict_cols, names), build)
+        track_old = self.on_change and set(self.tracked_columns) & (
+            set(names) - set(conflict_cols)
         )
-        await session.execute(statement)
 
-        item = await self.read(pk=pk, value=data[pk], session=session)
-        return item
+        upserted, old_rows = [], []
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start : start + chunk_size]
+            if track_old:
+                # старые значения отслеживаемых колонок у уже существующих строк
+                keys = tuple_(*(getattr(self.model, name) for name in conflict_cols))
+                query = select(*self._tracked()).where(
+                    keys.in_([conflict_key(row) for row in chunk])
+                )
+                old_rows.extend(await get_rows(session, query))
+            result = await session.execute(statement, chunk)
+            upserted.extend(result.mappings().all())
+
+        self._notify(session, [*old_rows, *upserted])
+        return [self._to_domain(row) for row in upserted]
 
     @maybe_session
     async def multiple_update(
@@ -105,19 +468,46 @@ class Repository:
         data: List[Dict],
         session: AsyncSession,
     ):
+        old_rows = []
+        if self.on_change and data:
+            # обновление по первичному ключу (bulk) не поддерживает RETURNING:
+            # старые значения отслеживаемых колонок читаются заранее
+            pk = self.model.__mapper__.primary_key[0]
+            query = select(*self._tracked()).where(
+                pk.in_([row[pk.key] for row in data])
+            )
+            old_rows = await get_rows(session, query)
         statement = update(self.model)
         await session.execute(statement, data)
+        self._notify(session, [*old_rows, *data])
 
-    @maybe_session
-    async def read_one(self, session: AsyncSession, **kwargs) -> AnyDomainModel:
-        result = await exactly_one(session, self.make_search_query(**kwargs))
-        return self.domain_model(**result.__dict__)
+    @maybe_session(read_only=True)
+    async def read_one(
+        self, session: AsyncSession, trusted: Optional[bool] = None, **kwargs
+    ) -> AnyDomainModel:
+        """Может поднять sqlalchemy.exc.NoResultFound"""
+
+        query, params = self._select(kwargs)
+        row = (await session.execute(query, params)).mappings().one()
+        return self._to_domain(row, trusted)
+
+
+def violated_constraint(exc: IntegrityError) -> Optional[str]:
+    """Имя нарушенного ограничения (asyncpg), None - если определить нельзя"""
+
+    return getattr(exc.orig.__cause__, "constraint_name", None)
 
 
 async def one_or_none(api_db: AsyncSession, query: Select) -> Optional[ModelType]:
     return (await api_db.execute(query)).unique().scalars().one_or_none()
 
 
+async def get_rows(
+    api_db: AsyncSession, query: Select, params: Optional[Dict[str, Any]] = None
+) -> Sequence[RowMapping]:
+    return (await api_db.execute(query, params)).mappings().all()
+
+
 async def get_list(api_db: AsyncSession, query: Select) -> List[ModelType]:
     return (await api_db.execute(query)).scalars().all()
 
@@ -136,5 +526,25 @@ async def get_total_rows(api_db: AsyncSession, query: Select) -> int:
     )
 
 
+async def get_estimated_rows(api_db: AsyncSession, query: Select) -> int:
+    """
+    Оценка числа строк по статистике планировщика (EXPLAIN), без COUNT
+    по всей таблице. Точность зависит от актуальности ANALYZE.
+    """
+
+    # значения фильтров - параметрами драйвера, а не литералами в тексте SQL
+    compiled = query.compile(dialect=api_db.get_bind().dialect)
+    params = compiled.construct_params()
+    connection = await api_db.connection()
+    result = await connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}",
+        tuple(params[name] for name in compiled.positiontup),
+    )
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = orjson.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
 async def get_first(api_db: AsyncSession, query: Select) -> Optional[ModelType]:
     return (await api_db.execute(query)).scalars().first()
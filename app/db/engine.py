@@ -0,0 +1,136 @@
+from collections import defaultdict
+from typing import Dict
+import time
+
+from sqlalchemy import event
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core import config
+from app.core.metrics import Histogram
+from app.core.metrics import LATENCY_BUCKETS
+
+
+class QueryCacheStats:
+    """
+    Попадания в кэш скомпилированного SQL (compiled_cache) по движкам:
+    cache_hit - запрос взят из кэша, cache_miss - скомпилирован заново,
+    no_cache_key / caching_disabled - не кэшируется вообще.
+    """
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.engines: Dict[str, AsyncEngine] = {}
+
+    def attach(self, name: str, engine: AsyncEngine):
+        self.engines[name] = engine
+        counters = self.counters[name]
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def count_cache_hit(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                counters[context.cache_hit.name.lower()] += 1
+
+    def get_stats(self) -> Dict[str, dict]:
+        stats = {}
+        for name, engine in self.engines.items():
+            counters = self.counters[name]
+            compiled = counters.get("cache_hit", 0) + counters.get("cache_miss", 0)
+            cache = engine.sync_engine._compiled_cache
+            stats[name] = dict(
+                counters=dict(counters),
+                hit_ratio=counters.get("cache_hit", 0) / compiled if compiled else None,
+                size=len(cache) if cache is not None else 0,
+                capacity=cache.capacity if cache is not None else 0,
+            )
+        return stats
+
+    def reset(self):
+        for counters in self.counters.values():
+            counters.clear()
+
+
+query_cache_stats = QueryCacheStats()
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.wait = Histogram(LATENCY_BUCKETS)
+        self.timeouts = 0
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул, который замеряет ожидание соединения (включая открытие нового):
+    долгое ожидание при обычной длительности запросов - нехватка пула.
+    """
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.wait.observe(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def get_pool_stats(engine: AsyncEngine) -> dict:
+    pool = engine.sync_engine.pool
+    return dict(
+        size=pool.size(),
+        max_overflow=pool._max_overflow,
+        checked_out=pool.checkedout(),
+        idle=pool.checkedin(),
+        overflow=max(pool.overflow(), 0),
+        timeouts=pool.metrics.timeouts,
+        wait_seconds=pool.metrics.wait.get_stats(),
+    )
+
+
+# движки по имени (primary, replica0, ...) - для статистики
+engines: Dict[str, AsyncEngine] = {}
+
+
+def make_engine(name: str, url: str, pool_size: int) -> AsyncEngine:
+    """
+    Движок с настроенными кэшами: скомпилированного SQL (query_cache_size,
+    в процессе) и подготовленных выражений asyncpg (на каждом соединении),
+    параметрами пула и statement_timeout на стороне сервера.
+    """
+
+    server_settings = {}
+    if config.DB_STATEMENT_TIMEOUT_SECONDS > 0:
+        timeout_ms = int(config.DB_STATEMENT_TIMEOUT_SECONDS * 1000)
+        server_settings["statement_timeout"] = str(timeout_ms)
+
+    engine = create_async_engine(
+        url,
+        echo=config.DEBUG,
+        poolclass=TimedQueuePool,
+        pool_size=pool_size,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT_SECONDS,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+        pool_recycle=config.DB_POOL_RECYCLE_SECONDS,
+        query_cache_size=config.DB_QUERY_CACHE_SIZE,
+        connect_args=dict(
+            prepared_statement_cache_size=config.DB_PREPARED_STATEMENT_CACHE_SIZE,
+            server_settings=server_settings,
+        ),
+        future=True,
+    )
+    engine.sync_engine.pool.metrics = PoolMetrics()
+    query_cache_stats.attach(name, engine)
+    engines[name] = engine
+    return engine
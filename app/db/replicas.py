@@ -0,0 +1,160 @@
+from itertools import count
+from typing import List
+from typing import Optional
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core import config
+from app.db.engine import make_engine
+
+
+# позиция WAL мастера; реплика, которая применила WAL до нее, не отстает
+PRIMARY_LSN_QUERY = text("SELECT pg_current_wal_lsn()::text")
+
+# отставание реплики в секундах: 0, если применен WAL до позиции мастера
+# (иначе на простаивающем мастере отставание росло бы без изменений), иначе -
+# время с последней примененной транзакции. Отключенный от мастера приемник
+# WAL тоже дает отставание. NULL - реплика позади, но еще ничего не применила.
+# Только функции, доступные любой роли (без pg_read_all_stats).
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_replay_lsn() >= CAST(CAST(:primary_lsn AS text) AS pg_lsn)
+            THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+class Replica:
+    def __init__(self, url: str, pool_size: int, name: str = "replica"):
+        self.engine = make_engine(name, url, pool_size)
+        self.session_factory = sessionmaker(
+            self.engine, class_=AsyncSession, expire_on_commit=False, autoflush=True
+        )
+        # до первой проверки реплика в ротации не участвует
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    async def check(self, max_lag_seconds: float, timeout: float, primary_lsn: str):
+        try:
+            lag = await asyncio.wait_for(
+                self._measure_lag(primary_lsn), timeout=timeout
+            )
+        except Exception as e:
+            self.fail(f"{type(e).__name__}: {e}")
+            return
+
+        if lag is None:
+            self.fail("behind the primary, nothing replayed yet")
+            return
+
+        self.lag_seconds = float(lag)
+        self.healthy = self.lag_seconds <= max_lag_seconds
+        self.error = None if self.healthy else "lag"
+
+    def fail(self, error: str):
+        self.healthy, self.lag_seconds, self.error = False, None, error
+
+    async def _measure_lag(self, primary_lsn: str) -> Optional[float]:
+        async with self.engine.connect() as connection:
+            return await connection.scalar(LAG_QUERY, dict(primary_lsn=primary_lsn))
+
+    def get_stats(self) -> dict:
+        return dict(
+            url=self.engine.url.render_as_string(hide_password=True),
+            healthy=self.healthy,
+            lag_seconds=self.lag_seconds,
+            error=self.error,
+        )
+
+
+class ReplicaSet:
+    """
+    Реплики для чтения. В фоне раз в check_interval_seconds измеряет отставание,
+    запросы распределяются по кругу между репликами с допустимым отставанием.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        pool_size: int,
+        max_lag_seconds: float,
+        check_interval_seconds: float,
+    ):
+        self.replicas = [
+            Replica(url, pool_size, name=f"replica{index}")
+            for index, url in enumerate(urls)
+        ]
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self._counter = count()
+        self._checker: Optional[asyncio.Task] = None
+        # мастер - точка отсчета отставания, задается в start_up
+        self.primary: Optional[AsyncEngine] = None
+
+    def choose(self) -> Optional[Replica]:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    async def check(self):
+        try:
+            primary_lsn = await asyncio.wait_for(
+                self._primary_lsn(), timeout=self.check_interval_seconds
+            )
+        except Exception as e:
+            # без позиции мастера отставание не измерить
+            for replica in self.replicas:
+                replica.fail(f"primary: {type(e).__name__}: {e}")
+            return
+
+        await asyncio.gather(
+            *(
+                replica.check(
+                    self.max_lag_seconds, self.check_interval_seconds, primary_lsn
+                )
+                for replica in self.replicas
+            )
+        )
+
+    async def _primary_lsn(self) -> str:
+        async with self.primary.connect() as connection:
+            return await connection.scalar(PRIMARY_LSN_QUERY)
+
+    async def _check_forever(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval_seconds)
+
+    async def start_up(self, primary: AsyncEngine):
+        self.primary = primary
+        if self.replicas:
+            self._checker = asyncio.create_task(self._check_forever())
+
+    async def gracefully_closing(self):
+        if self._checker is not None:
+            self._checker.cancel()
+            self._checker = None
+        for replica in self.replicas:
+            replica.healthy = False
+            await replica.engine.dispose()
+
+    def get_stats(self) -> List[dict]:
+        return [replica.get_stats() for replica in self.replicas]
+
+
+replica_set = ReplicaSet(
+    urls=config.DATABASE_REPLICA_URLS,
+    pool_size=config.DB_REPLICA_POOL_SIZE,
+    max_lag_seconds=config.DB_REPLICA_MAX_LAG_SECONDS,
+    check_interval_seconds=config.DB_REPLICA_CHECK_INTERVAL_SECONDS,
+)
@@ -1,24 +1,28 @@
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import partial
 from functools import wraps
+from typing import Awaitable
+from typing import Callable
+import logging
 
 from sqlalchemy import MetaData
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core import config
+from app.db.engine import make_engine
+from app.db.replicas import replica_set
 
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = config.DATABASE_URL
 
 
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=config.DEBUG,
-    pool_size=config.DB_POOL_SIZE,
-    future=True,
-)
+engine = make_engine("primary", DATABASE_URL, config.DB_POOL_SIZE)
 
 async_session = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False, autoflush=True
@@ -36,21 +40,71 @@ metadata = MetaData(naming_convention=convention)
 Base = declarative_base(metadata=metadata)
 
 
+# в контексте (запросе) уже была пишущая транзакция: читаем с мастера,
+# чтобы видеть свои изменения независимо от отставания реплик
+_wrote_to_primary: ContextVar[bool] = ContextVar("wrote_to_primary", default=False)
+
+
+def on_commit(session: AsyncSession, callback: Callable[[], Awaitable[None]]):
+    """
+    callback вызывается после фиксации транзакции сессии, когда изменения уже
+    видны другим сессиям (например, инвалидация кэша). При откате - не вызывается.
+    """
+
+    session.info.setdefault("on_commit", []).append(callback)
+
+
+async def run_on_commit(session: AsyncSession):
+    """
+    Вызывает callback-и on_commit; нужен после явного session.commit().
+    Ошибка callback-а только логируется: запись уже зафиксирована, и ошибка
+    в ответе привела бы к повтору уже примененного запроса.
+    """
+
+    for callback in session.info.pop("on_commit", []):
+        try:
+            await callback()
+        except Exception:
+            logger.exception("on_commit callback failed")
+
+
 @asynccontextmanager
-async def in_transaction() -> AsyncSession:
-    session = async_session()
+async def in_transaction(read_only: bool = False) -> AsyncSession:
+    """
+    read_only=True - транзакция на реплике, если есть реплика с допустимым
+    отставанием и в текущем контексте еще не было записи. Иначе - на мастере.
+    """
+
+    session_factory = async_session
+    replica = replica_set.choose() if read_only else None
+    if replica is not None and not _wrote_to_primary.get():
+        session_factory = replica.session_factory
+    elif not read_only:
+        _wrote_to_primary.set(True)
+
+    session = session_factory()
     await session.begin()
     try:
         yield session
         await session.commit()
     except BaseException:
+        session.info.pop("on_commit", None)
         await session.rollback()
         raise
     finally:
         await session.close()
+    await run_on_commit(session)
 
 
-def maybe_session(func):
+async def is_database_alive() -> bool:
+    """SELECT 1 на соединении из пула"""
+
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+    return True
+
+
+def maybe_session(func=None, *, read_only: bool = False):
     """
     Передает вызываемой функции сессию без изменений если она подается снаружи, однако
     если ессия не была подана, то запускает функцию с одноразовой сессии так же
@@ -59,12 +113,18 @@ def maybe_session(func):
     Удобно когда пишется группа методов для которых важно иметь возможность
     работать в одной транзакции. Так же удобно когда наличие транзакции не имеет значения.
 
+    @maybe_session(read_only=True) - для методов, которые только читают:
+    одноразовая сессия открывается на реплике (см. in_transaction).
+
     !!! Конвеншен при использовании:
     - Декорируемая функция должна иметь в сигнатуре jобязательный параметр session: AsyncSession.
     - При вызове декорируемой функции обязательно передавать сессию именно кейвордом в виде session=X
         либо не передавай её вообще.
     """
 
+    if func is None:
+        return partial(maybe_session, read_only=read_only)
+
     @wraps(func)
     async def wrapper(*args, **kwargs):
         session = kwargs.get("session")
@@ -72,7 +132,7 @@ def maybe_session(func):
         if session:
             value = await func(*args, **kwargs)
         else:
-            async with in_transaction() as new_session:
+            async with in_transaction(read_only=read_only) as new_session:
                 value = await func(*args, **kwargs, session=new_session)
         return value
 
@@ -1,24 +1,76 @@
+from typing import Optional
 import secrets
 import string
+import time
 
 from sqlalchemy import Column
 from sqlalchemy import DateTime
 from sqlalchemy import func
+from sqlalchemy import Index
 from sqlalchemy import String
 
+from app.core.settings import config
 from app.db.setup import Base
 
 
+# цифры и строчные буквы: лексикографический порядок один и тот же
+# в C и в языковых сортировках (COLLATE) PostgreSQL
+SORTABLE_ALPHABET = string.digits + string.ascii_lowercase
+SORTABLE_EPOCH_MS = 1577836800000  # 2020-01-01 UTC
+# 8 символов времени в мс (хватит до 2109 года) + 8 случайных (~41 бит)
+SORTABLE_TIME_LENGTH = 8
+SORTABLE_RANDOM_LENGTH = 8
+SORTABLE_ID_LENGTH = SORTABLE_TIME_LENGTH + SORTABLE_RANDOM_LENGTH
+
+
 def generate_user_id(length: int = 12) -> str:
     alphabet = string.ascii_letters + string.digits
     user_id = "".join(secrets.choice(alphabet) for _ in range(length))
     return user_id
 
 
+def _encode(value: int, length: int) -> str:
+    base = len(SORTABLE_ALPHABET)
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, base)
+        chars.append(SORTABLE_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def generate_sortable_id(timestamp_ms: Optional[int] = None) -> str:
+    """
+    id, упорядоченный по времени создания с точностью до миллисекунды:
+    новые записи попадают в правую страницу B-дерева, а не в случайную.
+    Случайная часть - от коллизий внутри одной миллисекунды.
+    """
+
+    if timestamp_ms is None:
+        timestamp_ms = time.time_ns() // 1_000_000
+    prefix = _encode(timestamp_ms - SORTABLE_EPOCH_MS, SORTABLE_TIME_LENGTH)
+    random_part = secrets.randbelow(len(SORTABLE_ALPHABET) ** SORTABLE_RANDOM_LENGTH)
+    return prefix + _encode(random_part, SORTABLE_RANDOM_LENGTH)
+
+
+def sortable_id_timestamp_ms(user_id: str) -> Optional[int]:
+    """Время создания из id generate_sortable_id, None - для случайных id"""
+
+    if len(user_id) != SORTABLE_ID_LENGTH:
+        return None
+    elapsed_ms = int(user_id[:SORTABLE_TIME_LENGTH], len(SORTABLE_ALPHABET))
+    return SORTABLE_EPOCH_MS + elapsed_ms
+
+
+def new_user_id() -> str:
+    if config.USER_ID_SORTABLE:
+        return generate_sortable_id()
+    return generate_user_id()
+
+
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(String(12), primary_key=True, default=generate_user_id)
+    id = Column(String(SORTABLE_ID_LENGTH), primary_key=True, default=new_user_id)
     name = Column(String(50), nullable=False)
     surname = Column(String(50), nullable=False)
     patronymic = Column(String(50), nullable=True)
@@ -27,3 +79,22 @@ class User(Base):
     country = Column(String(50), nullable=False)
     data_created = Column(DateTime(), server_default=func.now())
     date_modified = Column(DateTime(), server_default=func.now(), onupdate=func.now())
+
+    # нечеткий поиск (Repository.search): триграммные GIN-индексы pg_trgm
+    __table_args__ = (
+        *(
+            Index(
+                f"ix_users_{column}_trgm",
+                column,
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+            )
+            for column in ("name", "surname", "patronymic")
+        ),
+        Index(
+            "ix_users_email_lower_trgm",
+            func.lower(email).label("email_lower"),
+            postgresql_using="gin",
+            postgresql_ops={"email_lower": "gin_trgm_ops"},
+        ),
+    )
@@ -1,3 +1,10 @@
+from typing import Any
+from typing import AsyncIterator
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.clients.external_api.dadata.clients.dadata import dadata_api
@@ -5,6 +12,10 @@ from app.clients.external_api.dadata.schemas.response.dadata import (
     DadataCountryResponse,
 )
 from app.models.repositories.user import UserRepo
+from app.core.pagination import decode_cursor
+from app.core.pagination import encode_cursor
+from app.core.settings import config
+from app.db.setup import in_transaction
 from app.db.setup import maybe_session
 from app.models.domain.user import UserDomain
 from app.schemas.request.user import CreateUserRequestSchema
@@ -14,10 +25,7 @@ from app.schemas.request.user import CreateUserRequestSchema
 async def create_user(
     user: CreateUserRequestSchema, session: AsyncSession
 ) -> UserDomain:
-    if user.email:
-        await UserRepo.check_exists(**dict(email=user.email))
-    await UserRepo.check_exists(**dict(phone_number=user.phone_number))
-    user = await UserRepo.db_repo.create(session=session, **dict(user))
+    user = await UserRepo.create(session=session, **dict(user))
     if user.country:
         try:
             country_data: DadataCountryResponse = await dadata_api.get_country_info(
@@ -28,3 +36,94 @@ async def create_user(
         except Exception:
             pass
     return user
+
+
+async def create_users(users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Пакетное создание, коды стран запрашиваются одним пакетом на всех - после
+    фиксации: незафиксированные строки не держат соединение и уникальные
+    индексы на время запросов в dadata.
+    """
+
+    async with in_transaction() as session:
+        results = await UserRepo.bulk_create(users=users, session=session)
+    await set_country_codes(
+        [result["user"] for result in results if result["status"] == "created"]
+    )
+    return results
+
+
+async def set_country_codes(users: List[UserDomain]):
+    """Коды стран для нескольких пользователей одним пакетом запросов в dadata"""
+
+    countries = {user.country for user in users if user.country}
+    if not countries:
+        return
+
+    try:
+        countries_info = await dadata_api.get_countries_info(countries)
+    except Exception:
+        return
+    for user in users:
+        country_data = countries_info.get(user.country)
+        if country_data and len(country_data.suggestions) > 0:
+            user.country_code = country_data.suggestions[0].data.code
+
+
+async def list_users(
+    limit: int,
+    cursor: Optional[str] = None,
+    with_total: bool = False,
+    **filters: Any,
+) -> Tuple[List[UserDomain], Optional[str], Optional[int]]:
+    """
+    Страница пользователей по id (keyset), курсор следующей страницы и
+    оценка общего числа (with_total). Поднимает ValueError для невалидного курсора.
+    """
+
+    after = decode_cursor(cursor, str) if cursor else None
+    total = None
+    async with in_transaction(read_only=True) as session:
+        users, last_id = await UserRepo.db_repo.read_page(
+            session=session, order_by="id", limit=limit, after=after, **filters
+        )
+        if with_total:
+            total = await UserRepo.db_repo.estimate_count(session=session, **filters)
+
+    # коды стран - после закрытия сессии, чтобы не держать соединение на время dadata
+    await set_country_codes(users)
+    next_cursor = encode_cursor(last_id) if last_id is not None else None
+    return users, next_cursor, total
+
+
+async def search_users(q: str, limit: int) -> List[UserDomain]:
+    async with in_transaction(read_only=True) as session:
+        users = await UserRepo.search(q=q, limit=limit, session=session)
+    await set_country_codes(users)
+    return users
+
+
+async def export_users(**filters: Any) -> AsyncIterator[UserDomain]:
+    """Все пользователи через серверный курсор, коды стран - пачками"""
+
+    chunk_size = config.USER_EXPORT_CHUNK_SIZE
+    async with in_transaction(read_only=True) as session:
+        chunk = []
+        # строки из БД не валидируются повторно: ответ строится по схеме
+        async for user in UserRepo.db_repo.stream(
+            session=session,
+            order_by="id",
+            chunk_size=chunk_size,
+            trusted=True,
+            **filters,
+        ):
+            chunk.append(user)
+            if len(chunk) >= chunk_size:
+                await set_country_codes(chunk)
+                for item in chunk:
+                    yield item
+                chunk = []
+
+        await set_country_codes(chunk)
+        for item in chunk:
+            yield item
@@ -7,8 +7,14 @@ from sqlalchemy.exc import IntegrityError
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.routes import router
+from app.clients.external_api.dadata.clients.country_resolver import country_resolver
+from app.clients.external_api.dadata.clients.dadata import dadata_api
 from app.core import config
 from app.core.cache import base_cache
+from app.core.health import health_checker
+from app.db.replicas import replica_set
+from app.db.setup import engine
+from app.db.setup import is_database_alive
 
 
 def get_application() -> FastAPI:
@@ -64,6 +70,15 @@ def get_application() -> FastAPI:
         prefix=config.API_ROUTE,
     )
 
+    # при включенном переключении на память сервис работает и без redis
+    health_checker.register(
+        "redis", base_cache.is_alive, critical=not config.CACHE_FAILOVER_ENABLED
+    )
+    health_checker.register("postgres", is_database_alive)
+    health_checker.register(
+        "dadata", dadata_api.is_alive, critical=config.HEALTHCHECK_UPSTREAM_CRITICAL
+    )
+
     return application
 
 
@@ -73,8 +88,14 @@ app = get_application()
 @app.on_event("startup")
 async def startup_event():
     await base_cache.start_up()
+    await dadata_api.start_up()
+    if config.COUNTRY_RESOLVER_ENABLED:
+        country_resolver.start_up()
+    await replica_set.start_up(engine)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     await base_cache.gracefully_closing()
+    await dadata_api.gracefully_closing()
+    await replica_set.gracefully_closing()
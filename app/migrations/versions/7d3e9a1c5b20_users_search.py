@@ -0,0 +1,50 @@
+"""users search
+
+Revision ID: 7d3e9a1c5b20
+Revises: c0788607be04
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7d3e9a1c5b20"
+down_revision = "c0788607be04"
+branch_labels = None
+depends_on = None
+
+
+TRGM_COLUMNS = ("name", "surname", "patronymic")
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY - без блокировки записи в большую таблицу, вне транзакции
+    with op.get_context().autocommit_block():
+        for column in TRGM_COLUMNS:
+            op.create_index(
+                f"ix_users_{column}_trgm",
+                "users",
+                [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+                postgresql_concurrently=True,
+            )
+        op.create_index(
+            "ix_users_email_lower_trgm",
+            "users",
+            [sa.text("lower(email) gin_trgm_ops")],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in (
+            "ix_users_email_lower_trgm",
+            *(f"ix_users_{column}_trgm" for column in TRGM_COLUMNS),
+        ):
+            op.drop_index(name, table_name="users", postgresql_concurrently=True)
@@ -0,0 +1,38 @@
+"""users sortable id
+
+Revision ID: a41c6f0e9d53
+Revises: 7d3e9a1c5b20
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a41c6f0e9d53"
+down_revision = "7d3e9a1c5b20"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # увеличение длины varchar не перезаписывает таблицу и индекс
+    op.alter_column(
+        "users",
+        "id",
+        existing_type=sa.String(length=12),
+        type_=sa.String(length=16),
+        existing_nullable=False,
+    )
+
+
+def downgrade():
+    # не пройдет, если уже есть id длиннее 12 символов (USER_ID_SORTABLE)
+    op.alter_column(
+        "users",
+        "id",
+        existing_type=sa.String(length=16),
+        type_=sa.String(length=12),
+        existing_nullable=False,
+    )
@@ -1,9 +1,18 @@
+from functools import partial
 from typing import Any
 from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+import logging
 
 from fastapi import HTTPException
 from fastapi import status
+from pydantic import ValidationError
 from sqlalchemy import delete
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -11,43 +20,251 @@ from app.clients.external_api.dadata.clients.dadata import dadata_api
 from app.clients.external_api.dadata.schemas.response.dadata import (
     DadataCountryResponse,
 )
-from app.db.base import get_list
+from app.core.cache import get_handler
+from app.core.cache import NegativeEntry
+from app.core.cache import RedisCacheBaseHandler
+from app.core.settings import config
 from app.db.base import Repository
+from app.db.base import violated_constraint
 from app.db.setup import in_transaction
 from app.db.setup import maybe_session
+from app.db.setup import on_commit
 from app.db.tables.users import User as UserTable
 from app.models.domain.user import UserDomain
+from app.schemas.request.user import CreateUserRequestSchema
+
+
+logger = logging.getLogger(__name__)
+
+
+def user_cache_handler(phone_number: str) -> RedisCacheBaseHandler:
+    return get_handler(
+        key=f"{config.CACHE_NAMESPACE}_user_{phone_number}",
+        namespace=f"{config.CACHE_NAMESPACE}_user",
+        ttl_seconds=config.USER_CACHE_TTL_SECONDS,
+    )
+
+
+async def invalidate_user_cache(rows: List[Dict[str, Any]]):
+    if not config.USER_CACHE_ENABLED:
+        return
+
+    phone_numbers = {row["phone_number"] for row in rows if row.get("phone_number")}
+    for phone_number in phone_numbers:
+        await user_cache_handler(phone_number).invalidate(
+            guard_seconds=config.USER_CACHE_INVALIDATION_GUARD_SECONDS
+        )
+
+
+UNIQUE_FIELDS = ("phone_number", "email")
+# ограничения уникальности таблицы users и поля, которые они защищают
+UNIQUE_CONSTRAINTS = {
+    "ix_users_phone_number": "phone_number",
+    "uq_users_email": "email",
+}
+
+
+# поиск (UserRepo.search): похожие ФИО и email, содержащий запрос
+SEARCH_FUZZY_FIELDS = ("name", "surname", "patronymic")
+SEARCH_CONTAINS_FIELDS = ("email",)
+
+
+def validation_errors(exc: ValidationError) -> List[Dict[str, str]]:
+    return [
+        {
+            "loc": ".".join(map(str, error["loc"])),
+            "msg": error["msg"],
+            "type": error["type"],
+        }
+        for error in exc.errors()
+    ]
+
+
+def duplicate_errors(fields: Iterable[str]) -> List[Dict[str, str]]:
+    return [
+        {
+            "loc": field,
+            "msg": f"Пользователь с таким {field} уже существует",
+            "type": "value_error.duplicate",
+        }
+        for field in fields
+    ]
 
 
 class UserRepo:
     #используем композицию для доступа к репозиторию DB
     model = UserTable
     domain_model = UserDomain
-    db_repo = Repository(model=model, domain_model=domain_model)
+    db_repo = Repository(
+        model=model,
+        domain_model=domain_model,
+        on_change=invalidate_user_cache,
+        tracked_columns=("phone_number",),
+    )
 
     @classmethod
-    async def check_exists(cls, **fields: Dict[str, str]):
-        query = cls.db_repo.make_search_query(**fields)
-
-        async with in_transaction() as db:
-            users = await get_list(api_db=db, query=query)
+    @maybe_session
+    async def create(cls, session: AsyncSession, **fields: Any) -> UserDomain:
+        """
+        Создание одним INSERT без предварительных проверок: занятые phone_number
+        и email определяются по ограничениям уникальности. После ошибки
+        транзакция сессии прервана и откатывается.
+        """
 
-        if len(users) > 0:
-            field_details = ", ".join([f"{key}" for key, value in fields.items()])
+        try:
+            return await cls.db_repo.create(session=session, **fields)
+        except IntegrityError as e:
+            field = UNIQUE_CONSTRAINTS.get(violated_constraint(e))
+            if field is None:
+                raise
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Пользователь с таким {field_details} уже существует",
+                detail=f"Пользователь с таким {field} уже существует",
             )
 
     @classmethod
-    async def get_user(cls, pk: str, value: Any):
+    @maybe_session
+    async def find_existing(
+        cls,
+        phone_numbers: List[str],
+        emails: List[str],
+        session: AsyncSession,
+    ) -> List[Dict[str, Any]]:
+        """phone_number и email существующих пользователей - одним запросом"""
+
+        query = select(cls.model.phone_number, cls.model.email).where(
+            or_(
+                cls.model.phone_number.in_(phone_numbers),
+                cls.model.email.in_(emails),
+            )
+        )
+        return (await session.execute(query)).mappings().all()
+
+    @classmethod
+    @maybe_session
+    async def bulk_create(
+        cls,
+        users: List[Dict[str, Any]],
+        session: AsyncSession,
+    ) -> List[Dict[str, Any]]:
+        """
+        Создание пачки пользователей. Для каждой строки отдает dict(index, status,
+        user, errors), status - created, invalid (не прошла валидацию) или
+        duplicate (phone_number или email заняты в БД или ранее в пачке).
+        """
+
+        results: Dict[int, Dict[str, Any]] = {}
+        valid: Dict[int, Dict[str, Any]] = {}
+        for index, raw_user in enumerate(users):
+            try:
+                valid[index] = dict(CreateUserRequestSchema(**raw_user))
+            except ValidationError as e:
+                results[index] = dict(
+                    index=index, status="invalid", errors=validation_errors(e)
+                )
+
+        existing = await cls.find_existing(
+            phone_numbers=[user["phone_number"] for user in valid.values()],
+            emails=[user["email"] for user in valid.values() if user["email"]],
+            session=session,
+        )
+        taken = {
+            field: {row[field] for row in existing if row[field]}
+            for field in UNIQUE_FIELDS
+        }
+
+        to_create: Dict[str, int] = {}
+        for index, user in valid.items():
+            duplicates = [
+                field for field in UNIQUE_FIELDS if user[field] in taken[field]
+            ]
+            if duplicates:
+                results[index] = dict(
+                    index=index, status="duplicate", errors=duplicate_errors(duplicates)
+                )
+                continue
+            for field in UNIQUE_FIELDS:
+                if user[field]:
+                    taken[field].add(user[field])
+            to_create[user["phone_number"]] = index
+
+        created = await cls.db_repo.bulk_create(
+            [valid[index] for index in to_create.values()],
+            session=session,
+            chunk_size=config.USER_BATCH_CHUNK_SIZE,
+            # строки, занятые параллельным запросом после проверки, пропускаются
+            skip_conflicts=True,
+        )
+        for user in created:
+            index = to_create.pop(user.phone_number)
+            results[index] = dict(index=index, status="created", user=user)
+        for index in to_create.values():
+            results[index] = dict(
+                index=index,
+                status="duplicate",
+                errors=duplicate_errors([", ".join(UNIQUE_FIELDS)]),
+            )
+
+        return [results[index] for index in sorted(results)]
+
+    @classmethod
+    @maybe_session(read_only=True)
+    async def search(
+        cls, q: str, limit: int, session: AsyncSession
+    ) -> List[UserDomain]:
+        """По ФИО (похожие) и email (содержит q), индексы - ix_users_*_trgm"""
+
+        return await cls.db_repo.search(
+            q=q,
+            session=session,
+            fuzzy=SEARCH_FUZZY_FIELDS,
+            contains=SEARCH_CONTAINS_FIELDS,
+            limit=limit,
+            trusted=True,
+        )
+
+    @classmethod
+    async def _read(cls, pk: str, value: Any, primary: bool) -> UserDomain:
+        """
+        primary - чтение с мастера: значение попадет в кэш на весь TTL, а реплика
+        может отставать дольше, чем живет заглушка инвалидации
+        """
+
         try:
-            user: UserDomain = await cls.db_repo.read(pk=pk, value=value)
+            if not primary:
+                return await cls.db_repo.read(pk=pk, value=value)
+            async with in_transaction() as session:
+                return await cls.db_repo.read(pk=pk, value=value, session=session)
         except NoResultFound:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Пользователь с таким {pk} не найден",
             )
+
+    @classmethod
+    async def _get_cached(
+        cls, cache_handler: RedisCacheBaseHandler
+    ) -> Optional[UserDomain]:
+        """Ошибка redis или битая (устаревшая) запись в кэше - промах, а не ошибка"""
+
+        try:
+            cached_user = await cache_handler.get_value()
+            if cached_user is not None and not isinstance(cached_user, NegativeEntry):
+                return cls.domain_model(**cached_user)
+        except Exception:
+            logger.warning("user cache read failed", exc_info=True)
+        return None
+
+    @classmethod
+    async def get_user(cls, pk: str, value: Any):
+        cache_handler = None
+        if config.USER_CACHE_ENABLED and pk == "phone_number":
+            cache_handler = user_cache_handler(value)
+            cached_user = await cls._get_cached(cache_handler)
+            if cached_user is not None:
+                return cached_user
+
+        user = await cls._read(pk, value, primary=cache_handler is not None)
         if user.country:
             try:
                 country_data: DadataCountryResponse = await dadata_api.get_country_info(
@@ -58,15 +275,30 @@ class UserRepo:
             except Exception:
                 pass
 
+        # без кода страны (dadata недоступна) не кэшируем, чтобы не закрепить
+        # неполные данные на весь TTL
+        if cache_handler is not None and (user.country_code or not user.country):
+            # NX: не перезаписываем заглушку, оставленную инвалидацией
+            try:
+                await cache_handler.set_value(dict(user), only_if_absent=True)
+            except Exception:
+                logger.warning("user cache write failed", exc_info=True)
+
         return user
 
     @classmethod
     @maybe_session
     async def delete(cls, pk: str, value: Any, session: AsyncSession) -> None:
-        query = delete(cls.model).where(getattr(cls.model, pk) == value)
+        query = (
+            delete(cls.model)
+            .where(getattr(cls.model, pk) == value)
+            .returning(cls.model.phone_number)
+        )
         user_to_delete = await session.execute(query)
-        if user_to_delete.rowcount == 0:
+        deleted = user_to_delete.mappings().all()
+        if len(deleted) == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Пользователь с таким {pk} не найден",
             )
+        on_commit(session, partial(invalidate_user_cache, deleted))
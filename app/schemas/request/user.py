@@ -1,10 +1,16 @@
+from typing import Any
+from typing import Dict
+from typing import List
 from typing import Optional
 import re
 
 from pydantic import BaseModel
 from pydantic import EmailStr
+from pydantic import Field
 from pydantic import validator
 
+from app.core.settings import config
+
 
 class CreateUserRequestSchema(BaseModel):
     name: str
@@ -14,12 +20,19 @@ class CreateUserRequestSchema(BaseModel):
     email: Optional[EmailStr] = None
     country: str
 
-    @validator("name", "surname", "country")
+    @validator("name", "surname", "patronymic", "country")
     def max_length(cls, value):
         if len(value) > 50:
             raise ValueError("Максимальная длинна поля - 50 символов")
         return value
 
+    @validator("email")
+    def email_max_length(cls, value):
+        # длина колонки users.email
+        if value is not None and len(value) > 255:
+            raise ValueError("Максимальная длинна поля - 255 символов")
+        return value
+
     @validator("phone_number")
     def validate_phone_number(cls, value):
         if not (value.isdigit() and value.startswith("7") and len(value) <= 11):
@@ -39,3 +52,11 @@ class CreateUserRequestSchema(BaseModel):
                 "Only Cyrillic characters, spaces, and hyphens are allowed"
             )
         return value
+
+
+class CreateUsersBatchRequestSchema(BaseModel):
+    # строки валидируются по CreateUserRequestSchema по отдельности,
+    # невалидные попадают в ответ с ошибками, а не отклоняют всю пачку
+    users: List[Dict[str, Any]] = Field(
+        min_items=1, max_items=config.USER_BATCH_MAX_SIZE
+    )
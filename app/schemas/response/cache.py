@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+
+class CacheKeysPageResponseSchema(BaseModel):
+    # 0 - ключей больше нет, иначе передается в следующий запрос
+    cursor: int
+    keys: list[str]
+
+
+class CacheFlushResponseSchema(BaseModel):
+    prefix: str
+    deleted: int
+    batches: int
+    done: bool
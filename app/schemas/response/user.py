@@ -1,3 +1,6 @@
+from typing import Dict
+from typing import List
+from typing import Literal
 from typing import Optional
 
 from pydantic import BaseModel
@@ -12,3 +15,29 @@ class UserResponseSchema(BaseModel):
     email: Optional[str]
     country: str
     country_code: Optional[int]
+
+
+class UserBatchItemResponseSchema(BaseModel):
+    index: int
+    status: Literal["created", "invalid", "duplicate"]
+    user: Optional[UserResponseSchema]
+    errors: Optional[List[Dict[str, str]]]
+
+
+class UsersBatchResponseSchema(BaseModel):
+    created: int
+    failed: int
+    results: List[UserBatchItemResponseSchema]
+
+
+class UsersPageResponseSchema(BaseModel):
+    items: List[UserResponseSchema]
+    # None - страница последняя, иначе передается в следующий запрос
+    next_cursor: Optional[str]
+    # оценка по статистике БД, только при with_total=true
+    estimated_total: Optional[int]
+
+
+class UsersSearchResponseSchema(BaseModel):
+    # по убыванию похожести
+    items: List[UserResponseSchema]
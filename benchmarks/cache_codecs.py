@@ -0,0 +1,56 @@
+"""
+Сравнение кодеков кэша: время encode/decode и размер значения.
+
+    python benchmarks/cache_codecs.py [--number 2000]
+
+Нагрузка - справочник стран из снимка dadata (весь список) и одна страна.
+"""
+from pathlib import Path
+import argparse
+import json
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.clients.external_api.dadata.clients.country_resolver import (  # noqa: E402
+    latest_snapshot,
+)
+from app.core.codecs import CompressedCodec  # noqa: E402
+from app.core.codecs import decode  # noqa: E402
+from app.core.codecs import MsgpackCodec  # noqa: E402
+from app.core.codecs import OrjsonCodec  # noqa: E402
+
+
+def get_payloads() -> dict:
+    with latest_snapshot().open(encoding="utf8") as f:
+        countries = json.load(f)["countries"]
+    return dict(country=countries[0], countries=countries)
+
+
+def main(number: int):
+    codecs = [
+        OrjsonCodec(),
+        MsgpackCodec(),
+        CompressedCodec(OrjsonCodec(), threshold=1024),
+        CompressedCodec(MsgpackCodec(), threshold=1024),
+    ]
+
+    print(
+        f"{'payload':<10} {'codec':<14} {'bytes':>8} {'encode, us':>11} {'decode, us':>11}"
+    )
+    for payload_name, payload in get_payloads().items():
+        for codec in codecs:
+            data = codec.encode(payload)
+            encode = timeit.timeit(lambda: codec.encode(payload), number=number)
+            decode_time = timeit.timeit(lambda: decode(data), number=number)
+            print(
+                f"{payload_name:<10} {codec.name:<14} {len(data):>8} "
+                f"{encode / number * 1e6:>11.1f} {decode_time / number * 1e6:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=2000)
+    main(parser.parse_args().number)
@@ -0,0 +1,96 @@
+"""
+Стоимость чтения большого read_many: ORM-объекты против Core-строк
+(с валидацией доменной модели и без нее). Время и пик памяти на строку.
+
+    python benchmarks/repository_reads.py [--rows 20000]
+
+Запросы идут в SQLite в памяти, чтобы сравнивать только материализацию
+результата, а не сеть и драйвер БД.
+"""
+from pathlib import Path
+from typing import Callable
+import argparse
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.models.repositories.user import UserRepo  # noqa: E402
+
+
+def fill(session: Session, rows: int):
+    repo = UserRepo.db_repo
+    repo.model.__table__.create(session.get_bind())
+    session.execute(
+        insert(repo.model),
+        [
+            dict(
+                id=f"{i:012d}",
+                name="Иван",
+                surname="Иванов",
+                patronymic="Иванович",
+                phone_number=f"7{i:010d}",
+                email=f"user{i}@example.com",
+                country="Россия",
+            )
+            for i in range(rows)
+        ],
+    )
+
+
+def orm(session: Session) -> list:
+    repo = UserRepo.db_repo
+    records = session.execute(repo.make_search_query()).scalars().all()
+    return [repo.domain_model(**x.__dict__) for x in records]
+
+
+def core(trusted: bool) -> Callable[[Session], list]:
+    def read(session: Session) -> list:
+        repo = UserRepo.db_repo
+        rows = session.execute(repo.make_columns_query()).mappings().all()
+        return [repo._to_domain(row, trusted) for row in rows]
+
+    return read
+
+
+def measure(read: Callable[[Session], list], engine, rows: int) -> tuple:
+    with Session(engine) as session:
+        started = time.perf_counter()
+        read(session)
+        elapsed = time.perf_counter() - started
+
+    with Session(engine) as session:
+        tracemalloc.start()
+        result = read(session)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+
+    return elapsed / rows * 1e6, peak / rows
+
+
+def main(rows: int):
+    engine = create_engine("sqlite://")
+    with Session(engine) as session:
+        fill(session, rows)
+        session.commit()
+
+    print(f"{'mode':<16} {'us/row':>8} {'peak bytes/row':>15}")
+    for name, read in (
+        ("orm", orm),
+        ("core validated", core(trusted=False)),
+        ("core trusted", core(trusted=True)),
+    ):
+        per_row, peak = measure(read, engine, rows)
+        print(f"{name:<16} {per_row:>8.2f} {peak:>15.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    main(parser.parse_args().rows)
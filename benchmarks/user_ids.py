@@ -0,0 +1,96 @@
+"""
+Случайные id пользователей (generate_user_id) против упорядоченных по времени
+(generate_sortable_id): скорость генерации, а с --db - скорость вставки
+и размер индекса первичного ключа в PostgreSQL.
+
+    python benchmarks/user_ids.py [--rows 1000000] [--db]
+
+С --db нужен PostgreSQL из DATABASE_URL. Таблицы создаются в отдельной схеме
+bench_user_ids, которая удаляется в конце.
+"""
+from pathlib import Path
+from typing import Callable
+import argparse
+import asyncio
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from app.core import config  # noqa: E402
+from app.db.tables.users import generate_sortable_id  # noqa: E402
+from app.db.tables.users import generate_user_id  # noqa: E402
+
+
+SCHEMA = "bench_user_ids"
+BATCH_SIZE = 1000
+GENERATORS = (("random", generate_user_id), ("sortable", generate_sortable_id))
+
+
+def measure_generation(generate: Callable[[], str], rows: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rows):
+        generate()
+    return (time.perf_counter() - started) / rows * 1e6
+
+
+async def measure_inserts(generate: Callable[[], str], name: str, rows: int) -> tuple:
+    engine = create_async_engine(config.DATABASE_URL)
+    table = f"{SCHEMA}.users_{name}"
+    try:
+        async with engine.begin() as connection:
+            await connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+            await connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            await connection.execute(
+                text(
+                    f"CREATE TABLE {table} ("
+                    f"id varchar(16) PRIMARY KEY, payload varchar(50) NOT NULL)"
+                )
+            )
+
+        insert = text(f"INSERT INTO {table} (id, payload) VALUES (:id, :payload)")
+        started = time.perf_counter()
+        for start in range(0, rows, BATCH_SIZE):
+            batch = [
+                dict(id=generate(), payload="Иванов Иван Иванович")
+                for _ in range(min(BATCH_SIZE, rows - start))
+            ]
+            # отдельная транзакция на пачку, как при потоке создания пользователей
+            async with engine.begin() as connection:
+                await connection.execute(insert, batch)
+        elapsed = time.perf_counter() - started
+
+        async with engine.connect() as connection:
+            index_size = await connection.scalar(
+                text(f"SELECT pg_relation_size('{table}_pkey')")
+            )
+        return rows / elapsed, index_size
+    finally:
+        async with engine.begin() as connection:
+            await connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+def main(rows: int, db: bool):
+    print(f"{'generator':<10} {'us/id':>7}")
+    for name, generate in GENERATORS:
+        print(f"{name:<10} {measure_generation(generate, rows):>7.2f}")
+
+    if not db:
+        return
+
+    print(f"\n{'generator':<10} {'rows/s':>9} {'pk index MB':>12}")
+    for name, generate in GENERATORS:
+        per_second, index_size = asyncio.run(measure_inserts(generate, name, rows))
+        print(f"{name:<10} {per_second:>9.0f} {index_size / 2**20:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--db", action="store_true", help="вставка в PostgreSQL")
+    args = parser.parse_args()
+    main(args.rows, args.db)
@@ -0,0 +1,149 @@
+"""
+Поиск пользователей (GET /v1/users/search) на большой таблице: план запроса
+без Seq Scan и время ответа по нескольким запросам.
+
+    python benchmarks/user_search.py [--rows 1000000] [--repeat 50]
+
+Нужен PostgreSQL из DATABASE_URL с расширением pg_trgm. Таблица и индексы
+создаются в отдельной схеме bench_user_search, которая удаляется в конце.
+"""
+from pathlib import Path
+from typing import List
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from orjson import orjson  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from app.core import config  # noqa: E402
+from app.models.repositories.user import SEARCH_CONTAINS_FIELDS  # noqa: E402
+from app.models.repositories.user import SEARCH_FUZZY_FIELDS  # noqa: E402
+from app.models.repositories.user import UserRepo  # noqa: E402
+
+
+SCHEMA = "bench_user_search"
+QUERIES = ("Ивано", "Петровна", "Сидор", "alex", "user12345", "ольга")
+
+# ~1500 разных фамилий и ~40 имен, чтобы выборка по триграммам была реалистичной
+FILL = f"""
+INSERT INTO {SCHEMA}.users (id, name, surname, patronymic, phone_number, email, country)
+SELECT
+    lpad(i::text, 12, '0'),
+    (ARRAY['Иван', 'Петр', 'Сидор', 'Алексей', 'Ольга', 'Мария', 'Анна', 'Павел',
+           'Елена', 'Дмитрий', 'Сергей', 'Наталья', 'Андрей', 'Татьяна', 'Михаил',
+           'Ирина', 'Николай', 'Светлана', 'Юрий', 'Виктор', 'Галина', 'Борис',
+           'Людмила', 'Олег', 'Вера', 'Григорий', 'Нина', 'Роман', 'Лидия', 'Кирилл',
+           'Зоя', 'Федор', 'Раиса', 'Глеб', 'Ксения', 'Тимур', 'Алла', 'Егор',
+           'Инна', 'Лев'])[1 + i % 40],
+    (ARRAY['Ив', 'Пет', 'Сид', 'Кузн', 'Смирн', 'Поп', 'Вас', 'Соколь', 'Мих',
+           'Нов', 'Фед', 'Мороз', 'Волк', 'Алекс', 'Лебед', 'Сем', 'Ег', 'Павл',
+           'Коз', 'Степ', 'Никол', 'Орл', 'Андре', 'Макар', 'Захар', 'Зайц',
+           'Солов', 'Борис', 'Яковл', 'Григор', 'Роман', 'Воробь', 'Серге',
+           'Кузьм', 'Фрол', 'Алекса', 'Дмитри'])[1 + i % 37]
+    || (ARRAY['', 'ан', 'ин', 'ен', 'ар', 'ор', 'ул', 'ик', 'ан', 'ел', 'ач', 'уш',
+              'ен', 'ох', 'ет', 'ад', 'ош', 'ус', 'им', 'ак', 'ев', 'ир', 'он',
+              'ял', 'уч', 'ег', 'ыл', 'ай', 'ез', 'об', 'ут', 'ем', 'ош', 'ав',
+              'ин', 'ер', 'ол', 'ыш', 'ам', 'ей', 'ун'])[1 + (i / 37) % 41]
+    || 'ов',
+    (ARRAY['Иванович', 'Петровна', 'Сергеевич', 'Алексеевна', NULL])[1 + i % 5],
+    lpad(i::text, 11, '7'),
+    'user' || i || '@example.com',
+    'Россия'
+FROM generate_series(1, :rows) AS i
+"""
+
+
+def has_seq_scan(plan: dict) -> bool:
+    return plan["Node Type"] == "Seq Scan" or any(
+        has_seq_scan(child) for child in plan.get("Plans", ())
+    )
+
+
+async def prepare(session: AsyncSession, rows: int):
+    await session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    await session.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await session.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    # таблица и индексы - из метаданных модели, как после миграций
+    await session.run_sync(
+        lambda sync_session: UserRepo.model.__table__.create(sync_session.connection())
+    )
+    await session.execute(text(FILL), dict(rows=rows))
+    await session.execute(text(f"ANALYZE {SCHEMA}.users"))
+
+
+async def seq_scan(session: AsyncSession, q: str, plan_cache_mode: str) -> bool:
+    """
+    Есть ли Seq Scan в плане поискового запроса. force_generic_plan - план,
+    который PostgreSQL выбирает для подготовленного выражения (asyncpg
+    переиспользует их) после нескольких выполнений.
+    """
+
+    statement, params = UserRepo.db_repo._search(
+        q, SEARCH_FUZZY_FIELDS, SEARCH_CONTAINS_FIELDS, limit=20
+    )
+    compiled = statement.compile(dialect=session.get_bind().dialect)
+    values = compiled.construct_params(params)
+    connection = await session.connection()
+    await connection.exec_driver_sql(f"SET plan_cache_mode = {plan_cache_mode}")
+    result = await connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}",
+        tuple(values[name] for name in compiled.positiontup),
+    )
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = orjson.loads(plan)
+    return has_seq_scan(plan[0]["Plan"])
+
+
+async def main(rows: int, repeat: int):
+    # все в отдельной схеме; pg_trgm остается доступен из public
+    engine = create_async_engine(
+        config.DATABASE_URL,
+        connect_args=dict(server_settings=dict(search_path=f"{SCHEMA},public")),
+    )
+    try:
+        async with AsyncSession(engine) as session:
+            started = time.perf_counter()
+            await prepare(session, rows)
+            await session.commit()
+            print(f"fill {rows} rows: {time.perf_counter() - started:.1f}s")
+
+        print(
+            f"{'query':<12} {'found':>5} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'seq scan custom/generic':>24}"
+        )
+        async with AsyncSession(engine) as session:
+            for q in QUERIES:
+                timings: List[float] = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    users = await UserRepo.search(q=q, limit=20, session=session)
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+
+                custom = await seq_scan(session, q, "force_custom_plan")
+                generic = await seq_scan(session, q, "force_generic_plan")
+                print(
+                    f"{q:<12} {len(users):>5} {statistics.median(timings):>8.2f} "
+                    f"{timings[int(len(timings) * 0.95) - 1]:>8.2f} "
+                    f"{f'{custom}/{generic}':>24}"
+                )
+    finally:
+        async with engine.begin() as connection:
+            await connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
@@ -1,4 +1,5 @@
 from pathlib import Path
+import asyncio
 
 from alembic import command
 from alembic.config import Config
@@ -30,5 +31,38 @@ def rollback():
     command.downgrade(alembic_cfg, revision="-1")
 
 
+@app.command()
+def refresh_countries(concurrency: int = 5):
+    """Обновляет справочник стран из dadata и сохраняет его новой версией"""
+
+    from app.clients.external_api.dadata.clients.country_resolver import (
+        country_resolver,
+    )
+    from app.clients.external_api.dadata.clients.country_resolver import (
+        write_snapshot,
+    )
+    from app.clients.external_api.dadata.clients.dadata import dadata_api
+
+    async def refresh():
+        country_resolver.start_up()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(country):
+            async with semaphore:
+                return await dadata_api.find_country_by_id(country.alfa2) or country
+
+        await dadata_api.start_up()
+        try:
+            countries = await asyncio.gather(
+                *[fetch(country) for country in country_resolver.countries]
+            )
+        finally:
+            await dadata_api.gracefully_closing()
+        return write_snapshot(countries, source="dadata")
+
+    path = asyncio.run(refresh())
+    typer.echo(f"Справочник стран сохранен в {path}")
+
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,19 @@
+class FakeCache:
+    """Замена RedisBaseCache в памяти для тестов обработчиков кэша"""
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    async def set_value(self, key, value, ttl_seconds=30, nx=False):
+        if nx and key in self.values:
+            return False
+        self.values[key] = value
+        self.ttls[key] = ttl_seconds
+        return True
+
+    async def get_value(self, key):
+        return self.values.get(key)
+
+    async def delete_value(self, key):
+        self.values.pop(key, None)
@@ -0,0 +1,12 @@
+def make_user(phone_number, **fields):
+    """Строка пользователя для пакетных операций и ответов БД; fields - замены"""
+
+    user = dict(
+        name="Иван",
+        surname="Иванов",
+        patronymic="Иванович",
+        phone_number=phone_number,
+        country="Россия",
+    )
+    user.update(fields)
+    return user
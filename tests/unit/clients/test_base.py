@@ -0,0 +1,125 @@
+from unittest.mock import AsyncMock
+import asyncio
+
+import pytest
+
+from app.clients.base import BaseAPI
+from app.clients.exceptions import BadRequestAPIException
+from app.core.cache import get_handler
+from app.core.cache import NegativeEntry
+from app.core.cache import RedisCacheBaseHandler
+from tests.fixtures.cache import FakeCache
+
+
+class DummyAPI(BaseAPI):
+    base_url = "http://dummy"
+    limit = 7
+    limit_per_host = 3
+
+
+async def test_session_lifecycle():
+    assert DummyAPI.get_pool_stats() == dict(client="DummyAPI", active=False)
+
+    await DummyAPI.start_up()
+    session = DummyAPI._session
+    # повторный старт не пересоздает сессию
+    await DummyAPI.start_up()
+    assert DummyAPI._session is session
+    # сессия наследника не видна базовому классу
+    assert BaseAPI._session is None
+
+    stats = DummyAPI.get_pool_stats()
+    assert stats["active"] is True
+    assert stats["limit"] == 7
+    assert stats["limit_per_host"] == 3
+    assert stats["acquired"] == 0
+
+    await DummyAPI.gracefully_closing()
+    assert session.closed
+    assert DummyAPI._session is None
+
+
+async def test_cached_request_coalesces_misses(mocker):
+    cache_handler = get_handler(key="test_cached_request_coalesces", ttl_seconds=30)
+    mocker.patch.object(cache_handler, "set_value", new=AsyncMock())
+
+    async def slow_request(**kwargs):
+        await asyncio.sleep(0.01)
+        return 200, {"suggestions": []}
+
+    request = mocker.patch.object(DummyAPI, "_request", side_effect=slow_request)
+
+    api = DummyAPI()
+    results = await asyncio.gather(
+        *[api.cached_request(cache_handler, "get", "/path") for _ in range(5)]
+    )
+
+    assert request.call_count == 1
+    assert cache_handler.set_value.await_count == 1
+    assert all(result == (200, {"suggestions": []}) for result in results)
+
+
+async def test_cached_request_negative_caching(mocker):
+    cache = FakeCache()
+    cache_handler = RedisCacheBaseHandler(cache, key="negative", ttl_seconds=30)
+    request = mocker.patch.object(
+        DummyAPI, "_request", side_effect=BadRequestAPIException(400, "bad query")
+    )
+
+    api = DummyAPI()
+    for _ in range(2):
+        with pytest.raises(BadRequestAPIException):
+            await api.cached_request(cache_handler, "get", "/path")
+
+    assert request.call_count == 1
+    assert cache.ttls["negative"] == cache_handler.negative_ttl_seconds
+
+    cache.values.clear()
+    request.side_effect = None
+    request.return_value = (200, {"suggestions": []})
+    for _ in range(2):
+        response = await api.cached_request(
+            cache_handler,
+            "get",
+            "/path",
+            is_empty=lambda response: not response["suggestions"],
+        )
+        assert response == (200, {"suggestions": []})
+
+    assert request.call_count == 2
+    assert isinstance(await cache_handler.get_value(), NegativeEntry)
+
+
+async def test_cached_request_stale_while_revalidate(mocker):
+    now = mocker.patch("app.core.cache.time.time", return_value=1000)
+    cache = FakeCache()
+    cache_handler = RedisCacheBaseHandler(
+        cache, key="stale", ttl_seconds=30, stale_grace_seconds=60
+    )
+    await cache_handler.set_value({"version": 1})
+    assert cache.ttls["stale"] == 90
+
+    refreshed = asyncio.Event()
+
+    async def slow_request(**kwargs):
+        await refreshed.wait()
+        return 200, {"version": 2}
+
+    request = mocker.patch.object(DummyAPI, "_request", side_effect=slow_request)
+    api = DummyAPI()
+
+    # значение свежее
+    assert await api.cached_request(cache_handler, "get", "/") == (200, {"version": 1})
+    assert request.call_count == 0
+
+    # мягкий TTL истек: отдаем устаревшее значение, обновление одно на ключ
+    now.return_value = 1031
+    for _ in range(3):
+        response = await api.cached_request(cache_handler, "get", "/")
+        assert response == (200, {"version": 1})
+    await asyncio.sleep(0.01)
+    assert request.call_count == 1
+
+    refreshed.set()
+    await asyncio.sleep(0.01)
+    assert await cache_handler.get_entry() == ({"version": 2}, False)
@@ -0,0 +1,45 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.clients.external_api.dadata.clients.country_resolver import CountryResolver
+from app.clients.external_api.dadata.clients.country_resolver import latest_snapshot
+from app.clients.external_api.dadata.clients.dadata import dadata_api
+
+
+@pytest.fixture
+def resolver():
+    resolver = CountryResolver()
+    resolver.start_up()
+    return resolver
+
+
+def test_bundled_snapshot_is_loaded(resolver):
+    assert latest_snapshot() is not None
+    assert resolver.version is not None
+    assert len(resolver) > 200
+
+
+@pytest.mark.parametrize(
+    "country",
+    ["Россия", "  россия ", "Российская   Федерация", "RU", "rus", "643"],
+)
+def test_resolve_variants(resolver, country):
+    assert resolver.resolve(country).alfa2 == "RU"
+
+
+def test_resolve_unknown(resolver):
+    assert resolver.resolve("Атлантида") is None
+
+
+async def test_get_country_info_uses_resolver(mocker, resolver):
+    mocker.patch(
+        "app.clients.external_api.dadata.clients.dadata.country_resolver",
+        new=resolver,
+    )
+    cached_request = mocker.patch.object(dadata_api, "cached_request", new=AsyncMock())
+
+    response = await dadata_api.get_country_info("германия")
+
+    assert response.suggestions[0].data.alfa3 == "DEU"
+    cached_request.assert_not_awaited()
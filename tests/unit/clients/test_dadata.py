@@ -0,0 +1,56 @@
+from unittest.mock import AsyncMock
+
+from fastapi import HTTPException
+
+from app.clients.external_api.dadata.clients.dadata import dadata_api
+from app.core.settings import config
+
+
+COUNTRY_RESPONSE = {
+    "suggestions": [
+        {
+            "value": "Россия",
+            "unrestricted_value": "Россия",
+            "data": {
+                "code": 643,
+                "alfa2": "RU",
+                "alfa3": "RUS",
+                "name_short": "Россия",
+                "name": "Российская Федерация",
+            },
+        }
+    ]
+}
+
+
+async def test_get_countries_info(mocker):
+    mocker.patch.object(config, "COUNTRY_RESOLVER_ENABLED", False)
+    get_values = mocker.patch(
+        "app.clients.external_api.dadata.clients.dadata.get_values",
+        new=AsyncMock(return_value=[COUNTRY_RESPONSE, None, None]),
+    )
+
+    async def request_and_cache(cache_handler, json_data, **kwargs):
+        if json_data["query"] == "несуществующая":
+            raise HTTPException(status_code=400)
+        return 200, COUNTRY_RESPONSE
+
+    request = mocker.patch.object(
+        dadata_api, "request_and_cache", side_effect=request_and_cache
+    )
+
+    result = await dadata_api.get_countries_info(
+        ["Россия", " россия ", "Беларусь", "Несуществующая"]
+    )
+
+    handlers = get_values.await_args.args[0]
+    assert [handler.key for handler in handlers] == [
+        "my_project_get_country_info_россия",
+        "my_project_get_country_info_беларусь",
+        "my_project_get_country_info_несуществующая",
+    ]
+    assert request.call_count == 2
+    assert result["Россия"].suggestions[0].data.code == 643
+    assert result[" россия "] == result["Россия"]
+    assert result["Беларусь"] is not None
+    assert result["Несуществующая"] is None
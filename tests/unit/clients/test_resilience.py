@@ -0,0 +1,113 @@
+import pytest
+
+from app.clients.base import BaseAPI
+from app.clients.exceptions import BadRequestAPIException
+from app.clients.exceptions import CircuitOpenAPIException
+from app.clients.exceptions import ServerErrorAPIException
+from app.clients.resilience import CircuitBreaker
+from app.clients.resilience import RetryBudget
+
+
+class FlakyAPI(BaseAPI):
+    base_url = "http://flaky"
+    max_retries = 2
+    retry_backoff = 0
+    retry_budget_max = 10
+    breaker_failure_threshold = 3
+    breaker_recovery_seconds = 60
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    FlakyAPI._circuit_breaker = None
+    FlakyAPI._retry_budget = None
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, max_tokens=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_circuit_breaker_opens_and_recovers(mocker):
+    now = mocker.patch("app.clients.resilience.time.monotonic", return_value=0)
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_seconds=10)
+
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenAPIException):
+        breaker.before_call()
+
+    now.return_value = 11
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # второй вызов во время пробного отклоняется
+    with pytest.raises(CircuitOpenAPIException):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.get_stats()["failures"] == 0
+
+
+async def test_request_retries_server_errors(mocker):
+    send = mocker.patch.object(
+        FlakyAPI,
+        "_send",
+        side_effect=[ServerErrorAPIException(502, ""), (200, {"ok": True})],
+    )
+
+    assert await FlakyAPI._request(method="get", path="/") == (200, {"ok": True})
+    assert send.call_count == 2
+    assert FlakyAPI.get_circuit_breaker().state == CircuitBreaker.CLOSED
+
+
+async def test_request_does_not_retry_client_errors(mocker):
+    send = mocker.patch.object(
+        FlakyAPI, "_send", side_effect=BadRequestAPIException(400, "bad")
+    )
+
+    with pytest.raises(BadRequestAPIException):
+        await FlakyAPI._request(method="get", path="/")
+    assert send.call_count == 1
+
+
+async def test_open_circuit_short_circuits(mocker):
+    send = mocker.patch.object(
+        FlakyAPI, "_send", side_effect=ServerErrorAPIException(500, "")
+    )
+
+    with pytest.raises(ServerErrorAPIException):
+        await FlakyAPI._request(method="get", path="/")
+    assert send.call_count == 3
+    assert FlakyAPI.get_circuit_breaker().state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenAPIException):
+        await FlakyAPI._request(method="get", path="/")
+    assert send.call_count == 3
+    # состояние не разделяется между классами клиентов
+    assert BaseAPI.get_circuit_breaker() is not FlakyAPI.get_circuit_breaker()
+
+
+async def test_request_retries_only_idempotent_methods_by_default(mocker):
+    send = mocker.patch.object(
+        FlakyAPI, "_send", side_effect=ServerErrorAPIException(502, "")
+    )
+
+    with pytest.raises(ServerErrorAPIException):
+        await FlakyAPI._request(method="post", path="/")
+    assert send.call_count == 1
+
+    # запрос без побочных эффектов - повторы по явному согласию
+    send.reset_mock()
+    send.side_effect = [ServerErrorAPIException(502, ""), (200, {"ok": True})]
+    assert await FlakyAPI._request(method="post", path="/", retry=True) == (
+        200,
+        {"ok": True},
+    )
+    assert send.call_count == 2
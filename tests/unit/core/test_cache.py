@@ -0,0 +1,32 @@
+from unittest.mock import AsyncMock
+
+from orjson import orjson
+
+from app.core.cache import get_handler
+from app.core.cache import get_values
+from app.core.cache import set_values
+from app.core.cache import STALE_MARKER
+from app.core.codecs import decode
+
+
+async def test_set_and_get_values_in_one_round_trip(mocker):
+    base_cache = mocker.patch("app.core.cache.base_cache")
+    base_cache.set_many = AsyncMock()
+    base_cache.get_many = AsyncMock(return_value=[orjson.dumps({"a": 1}), None])
+
+    handlers = [
+        get_handler("key_1", ttl_seconds=30),
+        get_handler("key_2", ttl_seconds=10, stale_grace_seconds=5),
+    ]
+    await set_values([(handlers[0], {"a": 1}), (handlers[1], {"b": 2})])
+
+    items = base_cache.set_many.await_args.args[0]
+    assert items[0][0] == "key_1"
+    assert decode(items[0][1]) == {"a": 1}
+    assert items[0][2] == 30
+    assert items[1][0] == "key_2"
+    assert STALE_MARKER in decode(items[1][1])
+    assert items[1][2] == 15
+
+    assert await get_values(handlers) == [{"a": 1}, None]
+    base_cache.get_many.assert_awaited_once_with(["key_1", "key_2"])
@@ -0,0 +1,87 @@
+import asyncio
+
+from app.core.cache import RedisBaseCache
+from app.core.cache_backends import MemoryBackend
+from app.core.local_cache import LocalCache
+
+
+def memory_backend() -> MemoryBackend:
+    return MemoryBackend(LocalCache(max_entries=100, max_bytes=1024, ttl_seconds=60))
+
+
+class FlakyBackend(MemoryBackend):
+    """Основное хранилище, которое можно "уронить" """
+
+    def __init__(self):
+        super().__init__(memory_backend().local)
+        self.down = False
+        # сколько следующих удалений завершится ошибкой
+        self.failing_deletes = 0
+
+    async def get_many(self, keys):
+        if self.down:
+            raise ConnectionError("redis is down")
+        return await super().get_many(keys)
+
+    async def set(self, key, value, ttl_seconds, nx=False):
+        if self.down:
+            raise ConnectionError("redis is down")
+        return await super().set(key, value, ttl_seconds, nx)
+
+    async def delete_many(self, keys):
+        if self.down or self.failing_deletes:
+            self.failing_deletes = max(self.failing_deletes - 1, 0)
+            raise ConnectionError("redis is down")
+        return await super().delete_many(keys)
+
+    async def ping(self):
+        return not self.down
+
+
+async def test_memory_backend_nx_and_scan():
+    backend = memory_backend()
+    assert await backend.set("ns_a", b"1", 30) is True
+    assert await backend.set("ns_a", b"2", 30, nx=True) is False
+    assert await backend.get_many(["ns_a", "ns_b"]) == [b"1", None]
+    assert await backend.scan("ns_", 0, 100) == (0, [b"ns_a"])
+    assert await backend.delete_many(["ns_a", "ns_b"]) == 1
+
+
+async def test_failover_and_recovery():
+    primary = FlakyBackend()
+    cache = RedisBaseCache(primary, memory_backend(), reconnect_interval_seconds=0.01)
+    await cache.set_value("key", b"old")
+
+    primary.down = True
+    assert await cache.get_value("key") is None
+    assert cache.degraded
+    await cache.set_value("key", b"new")
+    assert await cache.get_value("key") == b"new"
+
+    primary.down = False
+    await asyncio.sleep(0.05)
+    assert not cache.degraded
+    # значение, измененное во время сбоя, удалено из основного хранилища
+    assert await cache.get_value("key") is None
+    assert cache.get_backend_stats()["failovers"] == 1
+
+
+async def test_recovery_retries_dirty_keys_after_error():
+    primary = FlakyBackend()
+    cache = RedisBaseCache(primary, memory_backend(), reconnect_interval_seconds=0.01)
+    for key in ("a", "b", "c"):
+        await cache.set_value(key, b"old")
+
+    primary.down = True
+    assert await cache.get_value("a") is None
+    for key in ("a", "b", "c"):
+        await cache.set_value(key, b"new")
+
+    # первое удаление после восстановления снова падает
+    primary.failing_deletes = 1
+    primary.down = False
+    await asyncio.sleep(0.05)
+
+    assert not cache.degraded
+    assert primary.failing_deletes == 0
+    assert await primary.get_many(["a", "b", "c"]) == [None, None, None]
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from orjson import orjson
+import pytest
+
+from app.core.codecs import CodecError
+from app.core.codecs import CompressedCodec
+from app.core.codecs import decode
+from app.core.codecs import get_codec
+from app.core.codecs import MsgpackCodec
+from app.core.codecs import OrjsonCodec
+
+VALUE = {"name": "Россия", "code": 643, "created_at": datetime(2026, 1, 1)}
+
+
+@pytest.mark.parametrize("codec", [OrjsonCodec(), MsgpackCodec()])
+def test_round_trip_matches_orjson(codec):
+    assert decode(codec.encode(VALUE)) == orjson.loads(orjson.dumps(VALUE))
+
+
+def test_compression_only_above_threshold():
+    codec = CompressedCodec(MsgpackCodec(), threshold=100)
+
+    small = codec.encode({"a": 1})
+    assert small == MsgpackCodec().encode({"a": 1})
+
+    large_value = [dict(VALUE, code=i) for i in range(100)]
+    large = codec.encode(large_value)
+    assert large[1:2] == CompressedCodec.tag
+    assert len(large) < len(MsgpackCodec().encode(large_value))
+    assert decode(large) == orjson.loads(orjson.dumps(large_value))
+
+
+def test_decode_legacy_and_unknown_values():
+    # значения, записанные до появления кодеков
+    assert decode(orjson.dumps({"a": 1})) == {"a": 1}
+
+    with pytest.raises(CodecError):
+        decode(b"\x00?data")
+    with pytest.raises(CodecError):
+        get_codec("pickle")
@@ -0,0 +1,39 @@
+import asyncio
+
+from app.core.health import HealthChecker
+
+
+async def test_results_are_cached_and_coalesced():
+    calls = []
+
+    async def check():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return True
+
+    checker = HealthChecker(timeout_seconds=1, cache_seconds=60)
+    checker.register("redis", check)
+
+    results = await asyncio.gather(*(checker.readiness() for _ in range(5)))
+    await checker.readiness()
+
+    assert len(calls) == 1
+    assert all(result["ready"] for result in results)
+
+
+async def test_timeout_and_non_critical_components():
+    async def hanging():
+        await asyncio.sleep(10)
+
+    async def failing():
+        raise ConnectionError("refused")
+
+    checker = HealthChecker(timeout_seconds=0.01, cache_seconds=0)
+    checker.register("dadata", failing, critical=False)
+    assert (await checker.readiness())["ready"] is True
+
+    checker.register("postgres", hanging)
+    readiness = await checker.readiness()
+    assert readiness["ready"] is False
+    errors = {item["component"]: item["error"] for item in readiness["components"]}
+    assert errors == {"dadata": "ConnectionError: refused", "postgres": "timeout 0.01s"}
@@ -0,0 +1,84 @@
+from orjson import orjson
+
+from app.core.cache_backends import escape_pattern
+from app.core.cache_backends import TieredBackend
+from app.core.local_cache import LocalCache
+
+
+def test_lru_eviction_by_entries():
+    cache = LocalCache(max_entries=2, max_bytes=1024, ttl_seconds=60)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.set("c", b"3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+    assert cache.evictions == 1
+
+
+def test_eviction_by_bytes():
+    cache = LocalCache(max_entries=100, max_bytes=10, ttl_seconds=60)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    cache.set("c", b"1")
+    assert cache.get("a") is None
+    assert cache.get_stats()["bytes"] == 6
+
+    # значение больше лимита не кэшируется
+    cache.set("big", b"x" * 11)
+    assert cache.get("big") is None
+
+
+def test_ttl(mocker):
+    now = mocker.patch("app.core.local_cache.time.monotonic", return_value=0)
+    cache = LocalCache(max_entries=10, max_bytes=1024, ttl_seconds=60)
+    cache.set("a", b"1")
+    # TTL в L1 не больше оставшегося TTL в redis
+    cache.set("b", b"2", ttl_seconds=5)
+
+    now.return_value = 10
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+
+    now.return_value = 61
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_handle_invalidation():
+    local = LocalCache(max_entries=10, max_bytes=1024, ttl_seconds=60)
+    backend = TieredBackend(local, remote=None, channel="invalidation")
+    local.set("a", b"1")
+    local.set("b", b"2")
+
+    # собственные сообщения игнорируются
+    own = dict(sender=backend.instance_id, keys=["a"])
+    backend.handle_invalidation(orjson.dumps(own))
+    assert local.get("a") == b"1"
+
+    backend.handle_invalidation(orjson.dumps(dict(sender="other", keys=["a"])))
+    assert local.get("a") is None
+    assert local.get("b") == b"2"
+
+    # ключ со "*" на конце - обычный ключ, а не сброс по префиксу
+    local.set("ns_*", b"1")
+    local.set("ns_a", b"1")
+    backend.handle_invalidation(orjson.dumps(dict(sender="other", keys=["ns_*"])))
+    assert local.get("ns_*") is None
+    assert local.get("ns_a") == b"1"
+
+    flush_prefix = dict(sender="other", prefixes=["ns_"])
+    backend.handle_invalidation(orjson.dumps(flush_prefix))
+    assert local.get("ns_a") is None
+    assert local.get("b") == b"2"
+
+    flush = dict(sender="other", prefixes=[""])
+    backend.handle_invalidation(orjson.dumps(flush))
+    assert len(local) == 0
+
+
+def test_escape_pattern():
+    assert escape_pattern("my_project") == "my_project"
+    assert escape_pattern("a*b?[c]") == "a\\*b\\?\\[c\\]"
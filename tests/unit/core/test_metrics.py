@@ -0,0 +1,47 @@
+import pytest
+
+from app.core.cache import decode_entry
+from app.core.cache import RedisCacheBaseHandler
+from app.core.metrics import CacheMetrics
+from app.core.metrics import cache_metrics
+from app.core.metrics import Histogram
+
+
+def test_histogram_quantiles():
+    hist = Histogram((1, 2, 5))
+    for value in (0.5, 1, 1.5, 2, 10):
+        hist.observe(value)
+
+    stats = hist.get_stats()
+    assert stats["count"] == 5
+    assert stats["buckets"] == {"1": 2, "2": 2, "5": 0, "+Inf": 1}
+    assert stats["p50"] == 2
+    assert stats["p99"] == float("inf")
+
+
+def test_timer_counts_errors():
+    metrics = CacheMetrics()
+    with metrics.timer("ns", "get"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.timer("ns", "get"):
+            raise ValueError
+
+    stats = metrics.get_stats()["ns"]
+    assert stats["counters"] == {"get": 2, "get_error": 1}
+    assert stats["get_latency"]["count"] == 2
+
+
+def test_decode_entry_counts_by_namespace():
+    cache_metrics.reset()
+    handler = RedisCacheBaseHandler(None, "my_project_user_79990000000")
+    assert handler.namespace == "my_project_user"
+
+    decode_entry(None, handler.namespace)
+    decode_entry(b'{"a": 1}', handler.namespace)
+    decode_entry(b'{"a": 1}', "other")
+
+    stats = cache_metrics.get_stats()
+    assert stats["my_project_user"]["counters"] == {"miss": 1, "hit": 1}
+    assert stats["my_project_user"]["hit_ratio"] == 0.5
+    assert stats["other"]["hit_ratio"] == 1.0
@@ -0,0 +1,21 @@
+import pytest
+
+from app.core.pagination import decode_cursor
+from app.core.pagination import encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("aZ09xYz12345")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == "aZ09xYz12345"
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+
+
+@pytest.mark.parametrize("value", [1, {"id": "a"}, None])
+def test_cursor_of_wrong_type_is_invalid(value):
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(value), str)
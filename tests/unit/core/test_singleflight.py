@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+async def test_concurrent_calls_are_coalesced():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    results = await asyncio.gather(*[single_flight.do("key", fetch) for _ in range(10)])
+
+    assert calls == 1
+    assert all(result == {"value": 1} for result in results)
+    assert single_flight.in_flight() == 0
+
+
+async def test_exception_is_shared_and_key_released():
+    single_flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream error")
+
+    results = await asyncio.gather(
+        *[single_flight.do("key", fetch) for _ in range(3)],
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert single_flight.in_flight() == 0
+
+    async def fetch_ok():
+        return 1
+
+    assert await single_flight.do("key", fetch_ok) == 1
+
+
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    single_flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return 1
+
+    first = asyncio.ensure_future(single_flight.do("key", fetch))
+    second = asyncio.ensure_future(single_flight.do("key", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == 1
+    with pytest.raises(asyncio.CancelledError):
+        await first
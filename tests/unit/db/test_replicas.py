@@ -0,0 +1,88 @@
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.db import setup
+from app.db.replicas import ReplicaSet
+
+
+def session_factory(name):
+    return MagicMock(return_value=AsyncMock(name=name, info={}))
+
+
+@pytest.fixture
+def replicas(mocker):
+    replica_set = ReplicaSet(
+        urls=[
+            "postgresql+asyncpg://u:p@replica1/db",
+            "postgresql+asyncpg://u:p@replica2/db",
+        ],
+        pool_size=1,
+        max_lag_seconds=5,
+        check_interval_seconds=1,
+    )
+    for index, replica in enumerate(replica_set.replicas):
+        replica.session_factory = session_factory(f"replica{index}")
+    mocker.patch.object(setup, "replica_set", replica_set)
+    mocker.patch.object(setup, "async_session", session_factory("primary"))
+    return replica_set
+
+
+def test_choose_skips_unhealthy_replicas(replicas):
+    assert replicas.choose() is None
+
+    first, second = replicas.replicas
+    first.healthy = second.healthy = True
+    assert {replicas.choose(), replicas.choose()} == {first, second}
+
+    # отставание больше порога - реплика выведена из ротации
+    second.healthy = False
+    assert [replicas.choose() for _ in range(3)] == [first] * 3
+    assert "p@" not in replicas.get_stats()[0]["url"]
+
+
+async def test_reads_go_to_replica_until_context_writes(replicas):
+    replica = replicas.replicas[0]
+    replica.healthy = True
+
+    async with setup.in_transaction(read_only=True):
+        pass
+    replica.session_factory.assert_called_once()
+
+    async with setup.in_transaction():
+        pass
+    setup.async_session.assert_called_once()
+
+    # read-your-writes: после записи чтение в этом контексте идет на мастер
+    async with setup.in_transaction(read_only=True):
+        pass
+    replica.session_factory.assert_called_once()
+    assert setup.async_session.call_count == 2
+
+
+async def test_lag_is_measured_against_primary_position(replicas, mocker):
+    mocker.patch.object(replicas, "_primary_lsn", new=AsyncMock(return_value="0/3"))
+    first, second = replicas.replicas
+    mocker.patch.object(first, "_measure_lag", new=AsyncMock(return_value=0))
+    # отстает и еще ничего не применила - LAG_QUERY отдает NULL
+    mocker.patch.object(second, "_measure_lag", new=AsyncMock(return_value=None))
+
+    await replicas.check()
+
+    first._measure_lag.assert_awaited_once_with("0/3")
+    assert first.healthy
+    assert not second.healthy
+    assert second.error == "behind the primary, nothing replayed yet"
+
+
+async def test_replicas_leave_rotation_without_primary_position(replicas, mocker):
+    replicas.replicas[0].healthy = True
+    mocker.patch.object(
+        replicas, "_primary_lsn", new=AsyncMock(side_effect=ConnectionError)
+    )
+
+    await replicas.check()
+
+    assert replicas.choose() is None
+    assert replicas.replicas[0].error.startswith("primary: ConnectionError")
@@ -0,0 +1,49 @@
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.db import setup
+
+
+@pytest.fixture(autouse=True)
+def primary(mocker):
+    session = AsyncMock(info={})
+    mocker.patch.object(setup, "async_session", MagicMock(return_value=session))
+    return session
+
+
+async def test_on_commit_runs_only_after_commit():
+    calls = []
+
+    async def callback():
+        calls.append("called")
+
+    async with setup.in_transaction() as session:
+        setup.on_commit(session, callback)
+        assert calls == []
+    assert calls == ["called"]
+
+    with pytest.raises(RuntimeError):
+        async with setup.in_transaction() as session:
+            setup.on_commit(session, callback)
+            raise RuntimeError
+    assert calls == ["called"]
+
+
+async def test_on_commit_errors_do_not_fail_committed_transaction(primary):
+    calls = []
+
+    async def failing():
+        raise ConnectionError("redis is down")
+
+    async def callback():
+        calls.append("called")
+
+    async with setup.in_transaction() as session:
+        setup.on_commit(session, failing)
+        setup.on_commit(session, callback)
+
+    primary.commit.assert_awaited_once()
+    # остальные callback-и все равно вызываются
+    assert calls == ["called"]
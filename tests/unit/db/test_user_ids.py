@@ -0,0 +1,35 @@
+from app.core.settings import config
+from app.db.tables.users import generate_sortable_id
+from app.db.tables.users import new_user_id
+from app.db.tables.users import SORTABLE_ID_LENGTH
+from app.db.tables.users import sortable_id_timestamp_ms
+
+
+def test_sortable_ids_follow_creation_time():
+    timestamps = [1681000000000, 1681000000001, 1681000001000, 1781000000000]
+    ids = [generate_sortable_id(timestamp) for timestamp in timestamps]
+
+    assert sorted(ids) == ids
+    assert all(len(user_id) == SORTABLE_ID_LENGTH for user_id in ids)
+    # только цифры и строчные буквы - порядок не зависит от COLLATE
+    assert all(user_id.isalnum() and user_id == user_id.lower() for user_id in ids)
+    assert [sortable_id_timestamp_ms(user_id) for user_id in ids] == timestamps
+
+
+def test_same_millisecond_ids_differ():
+    ids = {generate_sortable_id(1681000000000) for _ in range(1000)}
+
+    assert len(ids) == 1000
+
+
+def test_random_ids_by_default():
+    user_id = new_user_id()
+
+    assert len(user_id) == 12
+    assert sortable_id_timestamp_ms(user_id) is None
+
+
+def test_sortable_ids_when_enabled(mocker):
+    mocker.patch.object(config, "USER_ID_SORTABLE", True)
+
+    assert sortable_id_timestamp_ms(new_user_id()) is not None
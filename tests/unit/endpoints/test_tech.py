@@ -0,0 +1,57 @@
+from httpx import AsyncClient
+import pytest
+
+from app.core.health import HealthChecker
+from app.core.settings import config
+from app.main import app
+
+
+@pytest.fixture
+async def async_client():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        yield ac
+
+
+async def test_liveness(async_client):
+    response = await async_client.get("/v1/tech/health/live")
+    assert response.status_code == 200
+
+
+async def test_readiness_fails_on_critical_component(async_client, mocker):
+    async def alive():
+        return True
+
+    async def dead():
+        return False
+
+    checker = HealthChecker(timeout_seconds=1, cache_seconds=0)
+    checker.register("redis", alive)
+    mocker.patch("app.api.routes.v1.tech.health_checker", checker)
+
+    response = await async_client.get("/v1/tech/health/ready")
+    assert response.status_code == 200
+
+    checker.register("postgres", dead)
+    response = await async_client.get("/v1/tech/health/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+
+async def test_db_query_cache_stats(async_client):
+    response = await async_client.get("/v1/tech/db/query_cache")
+    assert response.status_code == 200
+
+    primary = response.json()["primary"]
+    assert primary["capacity"] == config.DB_QUERY_CACHE_SIZE
+    assert "counters" in primary
+
+
+async def test_db_pool_stats(async_client):
+    response = await async_client.get("/v1/tech/db/pool")
+    assert response.status_code == 200
+
+    primary = response.json()["primary"]
+    assert primary["size"] == config.DB_POOL_SIZE
+    assert primary["max_overflow"] == config.DB_MAX_OVERFLOW
+    assert primary["checked_out"] == 0
+    assert "p99" in primary["wait_seconds"]
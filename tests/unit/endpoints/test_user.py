@@ -65,3 +65,10 @@ async def test_create_user(
     # Проверяем, что пользователь действительно удален
     response = await async_client.get(f"v1/users/{phone_number}")
     assert response.status_code == 404
+
+
+@pytest.mark.parametrize("q", ["Ив", "   ", "  Ив  "])
+async def test_search_users_requires_three_characters(async_client, q):
+    response = await async_client.get("v1/users/search", params=dict(q=q))
+
+    assert response.status_code == 422
@@ -0,0 +1,68 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.logic import user as logic_user
+from app.models.repositories.user import UserRepo
+
+
+@pytest.fixture
+def transactions(mocker):
+    """Подменяет in_transaction; в списке - открыта ли сессия сейчас"""
+
+    state = []
+
+    @asynccontextmanager
+    async def in_transaction(read_only=False):
+        state.append(True)
+        try:
+            yield object()
+        finally:
+            state[-1] = False
+
+    # и для maybe_session, и для прямого использования в логике
+    mocker.patch("app.db.setup.in_transaction", new=in_transaction)
+    mocker.patch("app.logic.user.in_transaction", new=in_transaction)
+    return state
+
+
+@pytest.fixture
+def enrichment(mocker, transactions):
+    """set_country_codes, который запоминает, была ли открыта сессия"""
+
+    calls = []
+
+    async def set_country_codes(users):
+        calls.append(any(transactions))
+
+    mocker.patch("app.logic.user.set_country_codes", new=set_country_codes)
+    return calls
+
+
+async def test_list_users_enriches_after_session_is_closed(mocker, enrichment):
+    mocker.patch.object(
+        UserRepo.db_repo, "read_page", new=AsyncMock(return_value=([], None))
+    )
+    mocker.patch.object(
+        UserRepo.db_repo, "estimate_count", new=AsyncMock(return_value=0)
+    )
+
+    users, next_cursor, total = await logic_user.list_users(limit=10, with_total=True)
+
+    assert (users, next_cursor, total) == ([], None, 0)
+    assert enrichment == [False]
+
+
+async def test_search_users_enriches_after_session_is_closed(mocker, enrichment):
+    mocker.patch.object(UserRepo, "search", new=AsyncMock(return_value=[]))
+
+    assert await logic_user.search_users(q="Иван", limit=10) == []
+    assert enrichment == [False]
+
+
+async def test_create_users_enriches_after_commit(mocker, enrichment):
+    mocker.patch.object(UserRepo, "bulk_create", new=AsyncMock(return_value=[]))
+
+    assert await logic_user.create_users(users=[]) == []
+    assert enrichment == [False]
@@ -0,0 +1,73 @@
+from unittest.mock import AsyncMock
+
+from app.models.domain.user import UserDomain
+from app.models.repositories.user import UserRepo
+from tests.fixtures.users import make_user
+
+
+async def test_bulk_create_reports_each_row(mocker):
+    find_existing = mocker.patch.object(
+        UserRepo,
+        "find_existing",
+        new=AsyncMock(return_value=[dict(phone_number="79160000002", email=None)]),
+    )
+
+    async def bulk_create(rows, session, chunk_size, skip_conflicts):
+        # 79160000004 занят параллельным запросом - ON CONFLICT DO NOTHING
+        return [
+            UserDomain(id=f"id{row['phone_number']}", **row)
+            for row in rows
+            if row["phone_number"] != "79160000004"
+        ]
+
+    mocker.patch.object(UserRepo.db_repo, "bulk_create", new=bulk_create)
+
+    results = await UserRepo.bulk_create(
+        users=[
+            make_user("79160000001", email="a@example.com"),
+            make_user("79160000002"),
+            make_user("89160000003"),
+            make_user("79160000003", email="a@example.com"),
+            make_user("79160000004"),
+        ],
+        session=object(),
+    )
+
+    assert [result["status"] for result in results] == [
+        "created",
+        "duplicate",
+        "invalid",
+        "duplicate",
+        "duplicate",
+    ]
+    assert results[0]["user"].id == "id79160000001"
+    assert results[2]["errors"][0]["loc"] == "phone_number"
+    assert results[3]["errors"][0]["loc"] == "email"
+    # проверка дубликатов в БД - одним запросом
+    find_existing.assert_awaited_once()
+    assert find_existing.await_args.kwargs["phone_numbers"] == [
+        "79160000001",
+        "79160000002",
+        "79160000003",
+        "79160000004",
+    ]
+
+
+async def test_bulk_create_rejects_overlong_fields(mocker):
+    mocker.patch.object(UserRepo, "find_existing", new=AsyncMock(return_value=[]))
+    bulk_create = AsyncMock(return_value=[])
+    mocker.patch.object(UserRepo.db_repo, "bulk_create", new=bulk_create)
+
+    results = await UserRepo.bulk_create(
+        users=[
+            make_user("79160000001", patronymic="Иванович" * 10),
+            make_user("79160000002", email="a@" + ".".join(["b" * 60] * 5) + ".com"),
+        ],
+        session=object(),
+    )
+
+    # строки отклонены валидацией и не доходят до INSERT (DataError)
+    assert [result["status"] for result in results] == ["invalid", "invalid"]
+    assert results[0]["errors"][0]["loc"] == "patronymic"
+    assert results[1]["errors"][0]["loc"] == "email"
+    assert bulk_create.await_args.args[0] == []
@@ -0,0 +1,109 @@
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from app.db.base import Repository
+from app.db.setup import run_on_commit
+from app.db.tables.users import User
+from app.models.domain.user import UserDomain
+from tests.fixtures.users import make_user
+
+
+def make_result(rows):
+    result = MagicMock()
+    result.mappings.return_value.all.return_value = rows
+    return result
+
+
+def make_session():
+    async def execute(statement, params=None):
+        return make_result([dict(row, id=f"id{row['phone_number']}") for row in params])
+
+    return MagicMock(execute=AsyncMock(side_effect=execute))
+
+
+async def test_bulk_upsert_one_statement_per_chunk():
+    repo = Repository(model=User, domain_model=UserDomain)
+    session = make_session()
+
+    users = await repo.bulk_upsert(
+        rows=[
+            make_user("79160000001"),
+            make_user("79160000002"),
+            make_user("79160000003"),
+            # повтор по ключу - побеждает последняя строка
+            make_user("79160000001", name="Петр"),
+        ],
+        conflict_cols=["phone_number"],
+        session=session,
+        chunk_size=2,
+    )
+
+    assert {user.phone_number: user.name for user in users} == {
+        "79160000001": "Петр",
+        "79160000002": "Иван",
+        "79160000003": "Иван",
+    }
+    assert session.execute.await_count == 2
+
+    statements = {call.args[0] for call in session.execute.await_args_list}
+    assert len(statements) == 1
+    sql = str(statements.pop().compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (phone_number) DO UPDATE SET name = excluded.name" in sql
+    assert "phone_number = excluded.phone_number" not in sql
+    assert "RETURNING users.id" in sql
+
+
+async def test_bulk_upsert_notifies_old_and_new_values():
+    on_change = AsyncMock()
+    repo = Repository(
+        model=User,
+        domain_model=UserDomain,
+        on_change=on_change,
+        tracked_columns=("phone_number",),
+    )
+    session = MagicMock(
+        info={},
+        execute=AsyncMock(
+            side_effect=[
+                make_result([dict(phone_number="79160000009")]),
+                make_result([make_user("79160000001", id="id1")]),
+            ]
+        ),
+    )
+
+    await repo.bulk_upsert(
+        rows=[dict(id="id1", phone_number="79160000001")],
+        conflict_cols=["id"],
+        session=session,
+    )
+    # инвалидация - только после фиксации транзакции
+    on_change.assert_not_awaited()
+    await run_on_commit(session)
+
+    on_change.assert_awaited_once_with(
+        [dict(phone_number="79160000009"), dict(phone_number="79160000001")]
+    )
+
+
+async def test_multiple_update_notifies_rows_keyed_by_id():
+    on_change = AsyncMock()
+    repo = Repository(
+        model=User,
+        domain_model=UserDomain,
+        on_change=on_change,
+        tracked_columns=("phone_number",),
+    )
+    session = MagicMock(
+        info={},
+        execute=AsyncMock(
+            side_effect=[make_result([dict(phone_number="79160000009")]), None]
+        ),
+    )
+
+    await repo.multiple_update(data=[dict(id="id1", name="Петр")], session=session)
+    await run_on_commit(session)
+
+    # в строках обновления нет phone_number - берется из БД до обновления
+    on_change.assert_awaited_once_with([dict(phone_number="79160000009")])
@@ -0,0 +1,142 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.clients.external_api.dadata.schemas.response.dadata import DadataCountryData
+from app.clients.external_api.dadata.schemas.response.dadata import (
+    DadataCountryResponse,
+)
+from app.clients.external_api.dadata.schemas.response.dadata import (
+    DadataCountrySuggestion,
+)
+from app.core.cache import RedisCacheBaseHandler
+from app.core.settings import config
+from app.models.domain.user import UserDomain
+from app.models.repositories.user import invalidate_user_cache
+from app.models.repositories.user import UserRepo
+from tests.fixtures.cache import FakeCache
+
+
+@pytest.fixture
+def user():
+    return UserDomain(
+        id="abcdefghijkl",
+        name="Иван",
+        surname="Иванов",
+        patronymic="Иванович",
+        phone_number="79161234567",
+        email="ivan@example.com",
+        country="Россия",
+    )
+
+
+@pytest.fixture(autouse=True)
+def country_info(mocker):
+    data = DadataCountryData(
+        code=643,
+        alfa2="RU",
+        alfa3="RUS",
+        name_short="Россия",
+        name="Российская Федерация",
+    )
+    suggestion = DadataCountrySuggestion(
+        value="Россия", unrestricted_value="Россия", data=data
+    )
+    mocker.patch(
+        "app.models.repositories.user.dadata_api.get_country_info",
+        new=AsyncMock(return_value=DadataCountryResponse(suggestions=[suggestion])),
+    )
+
+
+@pytest.fixture
+def cache(mocker):
+    cache = FakeCache()
+    mocker.patch.object(config, "USER_CACHE_ENABLED", True)
+    mocker.patch(
+        "app.models.repositories.user.get_handler",
+        side_effect=lambda key, ttl_seconds, namespace: RedisCacheBaseHandler(
+            cache, key, ttl_seconds, namespace=namespace
+        ),
+    )
+    return cache
+
+
+async def test_get_user_read_through(mocker, cache, user):
+    read = mocker.patch.object(
+        UserRepo.db_repo, "read", new=AsyncMock(return_value=user)
+    )
+
+    first = await UserRepo.get_user(pk="phone_number", value=user.phone_number)
+    second = await UserRepo.get_user(pk="phone_number", value=user.phone_number)
+
+    assert read.await_count == 1
+    assert first.country_code == 643
+    assert second == first
+
+
+async def test_invalidation_blocks_stale_write(mocker, cache, user):
+    mocker.patch.object(config, "USER_CACHE_INVALIDATION_GUARD_SECONDS", 5)
+    read = mocker.patch.object(
+        UserRepo.db_repo, "read", new=AsyncMock(return_value=user)
+    )
+
+    await UserRepo.get_user(pk="phone_number", value=user.phone_number)
+    await invalidate_user_cache([dict(phone_number=user.phone_number)])
+
+    # после инвалидации чтение идет в БД, но не возвращает значение в кэш
+    await UserRepo.get_user(pk="phone_number", value=user.phone_number)
+    await UserRepo.get_user(pk="phone_number", value=user.phone_number)
+    assert read.await_count == 3
+
+
+async def test_invalidation_without_guard_deletes_key(mocker, cache, user):
+    mocker.patch.object(config, "USER_CACHE_INVALIDATION_GUARD_SECONDS", 0)
+    read = mocker.patch.object(
+        UserRepo.db_repo, "read", new=AsyncMock(return_value=user)
+    )
+
+    await UserRepo.get_user(pk="phone_number", value=user.phone_number)
+    await invalidate_user_cache([dict(phone_number=user.phone_number)])
+    assert cache.values == {}
+
+    await UserRepo.get_user(pk="phone_number", value=user.phone_number)
+    await UserRepo.get_user(pk="phone_number", value=user.phone_number)
+    assert read.await_count == 2
+
+
+async def test_cache_fill_reads_from_primary(mocker, cache, user):
+    replica = mocker.patch("app.db.setup.replica_set.choose")
+    read = mocker.patch.object(
+        UserRepo.db_repo, "read", new=AsyncMock(return_value=user)
+    )
+
+    await UserRepo.get_user(pk="phone_number", value=user.phone_number)
+
+    # сессия передана явно - реплика не выбиралась
+    assert read.await_args.kwargs["session"] is not None
+    replica.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "get_value",
+    [
+        AsyncMock(side_effect=ConnectionError("redis is down")),
+        # запись, которая больше не проходит валидацию модели
+        AsyncMock(return_value=dict(phone_number="79161234567")),
+    ],
+)
+async def test_cache_errors_fall_back_to_db(mocker, cache, user, get_value):
+    mocker.patch.object(RedisCacheBaseHandler, "get_value", new=get_value)
+    mocker.patch.object(
+        RedisCacheBaseHandler,
+        "set_value",
+        new=AsyncMock(side_effect=ConnectionError("redis is down")),
+    )
+    read = mocker.patch.object(
+        UserRepo.db_repo, "read", new=AsyncMock(return_value=user)
+    )
+
+    found = await UserRepo.get_user(pk="phone_number", value=user.phone_number)
+
+    assert found.id == user.id
+    read.assert_awaited_once()
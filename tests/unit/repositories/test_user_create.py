@@ -0,0 +1,47 @@
+from unittest.mock import AsyncMock
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+import pytest
+
+from app.models.repositories.user import UserRepo
+
+
+class UniqueViolationError(Exception):
+    def __init__(self, constraint_name):
+        self.constraint_name = constraint_name
+
+
+def integrity_error(constraint_name) -> IntegrityError:
+    orig = Exception("duplicate key value violates unique constraint")
+    orig.__cause__ = UniqueViolationError(constraint_name)
+    return IntegrityError("INSERT INTO users ...", {}, orig)
+
+
+@pytest.mark.parametrize(
+    "constraint_name, field",
+    [("uq_users_email", "email"), ("ix_users_phone_number", "phone_number")],
+)
+async def test_unique_violation_maps_to_400(mocker, constraint_name, field):
+    mocker.patch.object(
+        UserRepo.db_repo,
+        "create",
+        new=AsyncMock(side_effect=integrity_error(constraint_name)),
+    )
+
+    with pytest.raises(HTTPException) as e:
+        await UserRepo.create(session=object(), phone_number="79161234567")
+
+    assert e.value.status_code == 400
+    assert e.value.detail == f"Пользователь с таким {field} уже существует"
+
+
+async def test_unknown_constraint_is_reraised(mocker):
+    mocker.patch.object(
+        UserRepo.db_repo,
+        "create",
+        new=AsyncMock(side_effect=integrity_error("pk_users")),
+    )
+
+    with pytest.raises(IntegrityError):
+        await UserRepo.create(session=object(), phone_number="79161234567")
@@ -0,0 +1,99 @@
+from unittest.mock import AsyncMock
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from app.models.domain.user import UserDomain
+from app.models.repositories.user import UserRepo
+from tests.fixtures.users import make_user
+
+
+def make_record(user_id):
+    return make_user(f"7916{user_id}", id=user_id)
+
+
+async def test_read_page_is_keyset(mocker):
+    get_rows = mocker.patch(
+        "app.db.base.get_rows",
+        new=AsyncMock(return_value=[make_record(i) for i in ("b", "c", "d")]),
+    )
+
+    users, next_after = await UserRepo.db_repo.read_page(
+        session=object(), order_by="id", limit=2, after="a", country="Россия"
+    )
+
+    assert [user.id for user in users] == ["b", "c"]
+    assert next_after == "c"
+
+    _, query, params = get_rows.await_args.args
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "users.country = %(f_country)s" in sql
+    assert "users.id > %(after)s" in sql
+    assert "ORDER BY users.id" in sql
+    assert "LIMIT %(limit)s" in sql
+    assert params == dict(f_country="Россия", after="a", limit=3)
+    assert "OFFSET" not in sql
+    # только колонки доменной модели
+    assert "data_created" not in sql
+
+
+async def test_trusted_reads_skip_validation(mocker):
+    mocker.patch(
+        "app.db.base.get_rows",
+        new=AsyncMock(return_value=[dict(make_record("b"), phone_number=None)]),
+    )
+
+    users = await UserRepo.db_repo.read_many(session=object(), trusted=True)
+
+    assert isinstance(users[0], UserDomain)
+    assert users[0].phone_number is None
+    assert users[0].country_code is None
+
+
+async def test_last_page_has_no_cursor(mocker):
+    mocker.patch("app.db.base.get_rows", new=AsyncMock(return_value=[make_record("b")]))
+
+    users, next_after = await UserRepo.db_repo.read_page(
+        session=object(), order_by="id", limit=2
+    )
+
+    assert len(users) == 1
+    assert next_after is None
+
+
+def test_statements_are_reused():
+    repo = UserRepo.db_repo
+
+    query, params = repo._select(dict(country="Россия"), "id", 3, "a")
+    same_query, other_params = repo._select(dict(country="США"), "id", 5, "b")
+
+    # тот же объект запроса - в кэше движка он компилируется один раз
+    assert same_query is query
+    assert other_params == dict(f_country="США", after="b", limit=5)
+
+    list_query, params = repo._select(dict(id=["a", "b"]))
+    assert list_query is not query
+    assert "IN (__[POSTCOMPILE_f_id])" in str(
+        list_query.compile(dialect=postgresql.dialect())
+    )
+
+
+async def test_estimate_count_binds_filter_values():
+    connection = AsyncMock()
+    connection.exec_driver_sql.return_value.scalar = lambda: [
+        {"Plan": {"Plan Rows": 42}}
+    ]
+    session = AsyncMock()
+    session.get_bind = lambda: AsyncMock(dialect=asyncpg.dialect())
+    session.connection.return_value = connection
+
+    name = "Иван :x 100%"
+    total = await UserRepo.db_repo.estimate_count(session=session, name=name)
+
+    assert total == 42
+    sql, params = connection.exec_driver_sql.await_args.args
+    # значение уходит параметром, а не литералом в тексте запроса
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert "users.name = $1" in sql
+    assert name not in sql
+    assert params == (name,)
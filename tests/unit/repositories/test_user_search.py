@@ -0,0 +1,20 @@
+from unittest.mock import AsyncMock
+
+from sqlalchemy.dialects import postgresql
+
+from app.models.repositories.user import UserRepo
+
+
+async def test_search_is_ranked_and_uses_trigram_operators(mocker):
+    get_rows = mocker.patch("app.db.base.get_rows", new=AsyncMock(return_value=[]))
+
+    await UserRepo.search(q="Ivan_%", limit=5, session=object())
+
+    _, query, params = get_rows.await_args.args
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "users.surname %% %(q)s" in sql
+    assert "lower(users.email) LIKE %(pattern)s ESCAPE '/'" in sql
+    assert "ORDER BY greatest(similarity(users.name, %(q)s)" in sql
+    assert "LIMIT %(limit)s" in sql
+    # спецсимволы LIKE в запросе экранируются
+    assert params == dict(q="ivan_%", pattern="%ivan/_/%%", limit=5)